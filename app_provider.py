@@ -0,0 +1,87 @@
+# Shared, lazily built test app
+# Every test module and helper uses the same app, built with create_app(Test) on first use
+# Usage: python app_provider.py [--budget-ms N] for the import-time report
+import sys, json, time, argparse, importlib, subprocess
+
+from werkzeug.local import LocalProxy
+
+built_app = None
+
+
+# Build the app once per process
+def get_app():
+	global built_app
+	if built_app is None:
+		from app import create_app
+		from config import Test
+		built_app = create_app(Test)
+	return built_app
+
+# A fresh test client (own cookie jar) on the shared app
+def get_client():
+	return get_app().test_client()
+
+# Module-level stand-in for `app = create_app(Test)`, which only builds on first attribute access
+app = LocalProxy(get_app)
+
+# Config settings that name a folder uploads are written to, e.g. UPLOAD_FOLDER or LIBRARY_UPLOAD_DIR
+def is_upload_folder(name):
+	return 'UPLOAD' in name and (name.endswith('FOLDER') or name.endswith('DIR'))
+
+
+### Import-time report
+# Modules the test suite imports, in the order the test modules import them
+IMPORT_TARGETS = [
+	'flask',
+	'config',
+	'app',
+	'app.models',
+	'app.classes.models',
+	'app.files.models',
+	'app.api.models',
+	'app.goals.models',
+	'app.consultations.models',
+	'helper_functions',
+]
+
+# Time each import incrementally, then the app build and test collection, in the current process
+def measure_startup():
+	timings = {}
+	for module in IMPORT_TARGETS:
+		started = time.perf_counter()
+		try:
+			importlib.import_module(module)
+		except ImportError:
+			continue
+		timings['import ' + module] = time.perf_counter() - started
+
+	started = time.perf_counter()
+	get_app()
+	timings['create_app(Test)'] = time.perf_counter() - started
+
+	import unittest
+	started = time.perf_counter()
+	unittest.defaultTestLoader.discover('.', pattern = 'test_*.py')
+	timings['collect test_*.py'] = time.perf_counter() - started
+	return timings
+
+# Run measure_startup in a fresh interpreter so nothing is already cached in sys.modules
+def startup_report():
+	output = subprocess.check_output([sys.executable, '-c',
+		'import json, app_provider; print(json.dumps(app_provider.measure_startup()))'])
+	return json.loads(output.decode().strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description = 'Report the startup cost of the test suite')
+	parser.add_argument('--budget-ms', type = float, help = 'Fail if test collection takes longer than this')
+	args = parser.parse_args()
+
+	timings = startup_report()
+	for name, duration in timings.items():
+		print('%10.1f ms  %s' % (duration * 1000, name))
+
+	collection_ms = timings['collect test_*.py'] * 1000
+	if args.budget_ms is not None and collection_ms > args.budget_ms:
+		print('Test collection took %.1f ms, over the %.1f ms budget' % (collection_ms, args.budget_ms))
+		sys.exit(1)
@@ -0,0 +1,251 @@
+# Python testing framework
+import os, time, atexit, unittest, warnings
+
+# Flask 
+from app_provider import app
+
+# Flask models
+from app import db
+from sqlalchemy import event
+
+from query_counter import QueryCounter
+from route_timer import RouteTimer
+import duration_history
+
+# Run every test over real HTTP against a local multi-worker server (see live_server.py)
+SERVER = bool(os.environ.get('TEST_SERVER'))
+
+# Optional tooling is only imported when it is switched on, so it stays out of the startup cost
+if SERVER:
+	import live_server
+	ignored = [name for name in ('TEST_QUERY_REPORT', 'TEST_PROFILE', 'TEST_TEMPLATE_REPORT') if os.environ.get(name)]
+	if ignored:
+		warnings.warn('%s ignored with TEST_SERVER, requests run in the server workers' % ', '.join(ignored), RuntimeWarning)
+if os.environ.get('TEST_PROFILE'):
+	import profiling
+if os.environ.get('TEST_TEMPLATE_REPORT'):
+	import template_timer
+
+# Isolation mode, 'transaction' (default) or 'recreate' for the old drop_all/create_all per test
+# Server workers use their own connections and cannot see an open transaction, so they always recreate
+ISOLATION = 'recreate' if SERVER else os.environ.get('TEST_ISOLATION', 'transaction')
+
+# Engines whose schema has already been created in this process
+schema_ready = set()
+
+# Fixed setUp + tearDown cost of each test, in seconds
+fixture_timings = {}
+
+# Print every test's per-request query report when TEST_QUERY_REPORT is set
+QUERY_REPORT = bool(os.environ.get('TEST_QUERY_REPORT'))
+
+
+### Shared base test case
+# Creates the schema once per process and wraps each test in an outer transaction
+# Every commit made by helper_functions or a request handler only releases a SAVEPOINT,
+# and the outer transaction is rolled back on tearDown
+class BaseTestCase(unittest.TestCase):
+
+	# The Flask app to build the test client from, shared by every test module
+	flask_app = app
+
+	# Maximum SQL queries per request, keyed by 'METHOD route' patterns matched against the
+	# route template or the path, e.g. {'GET /classes/attendance/view/*': 20}
+	query_budgets = {}
+
+	# On budgeted routes, one statement repeated this many times in a request fails the test as N+1
+	n_plus_one_threshold = 5
+
+	# Time the whole test, fixtures included, and store it with its outcome in the duration history
+	def run(self, result = None):
+		if not duration_history.ENABLED or result is None:
+			return super().run(result)
+		result = OutcomeResult(result)
+		self.route_timer = None
+		started = time.perf_counter()
+		try:
+			return super().run(result)
+		finally:
+			duration_history.record(self.id(), time.perf_counter() - started, result.outcome,
+				self.route_timer.durations if self.route_timer is not None else None)
+
+	def setUp(self):
+		started = time.perf_counter()
+		if SERVER:
+			self.app = self.live_client = live_server.LiveClient()
+		else:
+			self.app = self.flask_app.test_client()
+
+		if ISOLATION == 'recreate':
+			db.drop_all()
+			db.create_all()
+		else:
+			create_schema_once()
+			self.begin_outer_transaction()
+
+		# Server workers serve requests in other processes, where none of the per-request signals reach us
+		self.query_counter = None
+		if SERVER:
+			if self.query_budgets:
+				warnings.warn('%s: query budgets are not checked with TEST_SERVER, requests run in the server workers' % self.id(), RuntimeWarning)
+		elif self.query_budgets or QUERY_REPORT:
+			self.query_counter = QueryCounter(unwrap(self.flask_app), db.engine).start()
+
+		if os.environ.get('TEST_TEMPLATE_REPORT') and not SERVER:
+			template_timer.time_suite(unwrap(self.flask_app))
+		if duration_history.ENABLED and not SERVER:
+			self.route_timer = RouteTimer(unwrap(self.flask_app)).start()
+
+		self.fixture_time = time.perf_counter() - started
+		self.profiler = None
+		if os.environ.get('TEST_PROFILE') and not SERVER:
+			self.profiler = profiling.profile_test(unwrap(self.flask_app), self.id())
+
+	def tearDown(self):
+		# unittest keeps failed tests, and so their client, alive until the run ends, and every
+		# open connection holds one of the server's workers
+		if SERVER:
+			self.live_client.close()
+
+		if self.profiler is not None:
+			self.profiler.stop()
+
+		if getattr(self, 'route_timer', None) is not None:
+			self.route_timer.stop()
+
+		started = time.perf_counter()
+		query_violations = self.stop_query_counter()
+
+		if ISOLATION == 'recreate':
+			db.session.remove()
+			db.drop_all()
+		else:
+			self.rollback_outer_transaction()
+
+		self.fixture_time += time.perf_counter() - started
+		fixture_timings[self.id()] = self.fixture_time
+
+		if query_violations:
+			self.fail('Query budget exceeded:\n' + '\n'.join(query_violations) + '\n\n' + self.query_counter.report())
+
+	def stop_query_counter(self):
+		if self.query_counter is None:
+			return []
+		self.query_counter.stop()
+		if QUERY_REPORT:
+			print('\nQueries for ' + self.id() + '\n' + self.query_counter.report())
+		return self.query_counter.violations(self.query_budgets, self.n_plus_one_threshold)
+
+	# Bind a fresh scoped session to a single connection with an open transaction
+	def begin_outer_transaction(self):
+		self.original_session = db.session
+		self.connection = db.engine.connect()
+
+		# pysqlite does not emit BEGIN itself, which breaks SAVEPOINTs
+		if self.connection.dialect.name == 'sqlite':
+			self.sqlite_isolation_level = self.connection.connection.isolation_level
+			self.connection.connection.isolation_level = None
+			event.listen(self.connection, 'begin', emit_sqlite_begin)
+
+		self.transaction = self.connection.begin()
+
+		session = db.create_scoped_session(options={'bind': self.connection, 'binds': {}})
+		event.listen(session, 'after_transaction_end', restart_savepoint)
+
+		# Flask-SQLAlchemy removes the session after each request
+		# Discard uncommitted work instead, so the savepoint chain stays on our connection
+		session.remove = session.rollback
+
+		db.session = session
+		db.session.begin_nested()
+
+	# Throw away everything the test wrote, including committed rows
+	def rollback_outer_transaction(self):
+		db.session.close()
+		self.transaction.rollback()
+		if self.connection.dialect.name == 'sqlite':
+			self.connection.connection.isolation_level = self.sqlite_isolation_level
+		self.connection.close()
+		db.session = self.original_session
+
+
+# Passes every call on to the runner's result, noting the test's outcome on the way
+# Works with any result object (unittest's, pytest's), whether or not it keeps lists of failures
+class OutcomeResult:
+
+	def __init__(self, result):
+		self.result = result
+		self.outcome = 'passed'
+
+	# addSubTest only exists when the runner's result has it, since unittest checks for it
+	def __getattr__(self, name):
+		if name == 'addSubTest' and hasattr(self.result, 'addSubTest'):
+			return self.sub_test_added
+		return getattr(self.result, name)
+
+	def addFailure(self, test, err):
+		self.outcome = 'failed'
+		self.result.addFailure(test, err)
+
+	def addError(self, test, err):
+		self.outcome = 'error'
+		self.result.addError(test, err)
+
+	def addSkip(self, test, reason):
+		self.outcome = 'skipped'
+		self.result.addSkip(test, reason)
+
+	def addUnexpectedSuccess(self, test):
+		self.outcome = 'failed'
+		self.result.addUnexpectedSuccess(test)
+
+	def sub_test_added(self, test, subtest, err):
+		if err is not None:
+			self.outcome = 'failed' if issubclass(err[0], test.failureException) else 'error'
+		self.result.addSubTest(test, subtest, err)
+
+
+# The real app behind app_provider's LocalProxy, which signal senders are compared against
+def unwrap(flask_app):
+	return getattr(flask_app, '_get_current_object', lambda: flask_app)()
+
+
+# Create all tables the first time a test runs against this engine
+def create_schema_once():
+	url = str(db.engine.url)
+	if url in schema_ready:
+		return
+	db.session.remove()
+	db.drop_all()
+	db.create_all()
+	schema_ready.add(url)
+
+
+def emit_sqlite_begin(connection):
+	connection.execute('BEGIN')
+
+
+# Open a new SAVEPOINT whenever the previous one is released or rolled back
+def restart_savepoint(session, transaction):
+	if transaction.nested and not transaction._parent.nested:
+		session.expire_all()
+		session.begin_nested()
+
+
+# Print the per-test fixed cost when TEST_TIMING_REPORT is set
+# Run the suite once with TEST_ISOLATION=recreate and once without to compare
+def print_timing_report():
+	if not os.environ.get('TEST_TIMING_REPORT') or not fixture_timings:
+		return
+	timings = sorted(fixture_timings.values())
+	total = sum(timings)
+	print('\nFixture timing report (isolation: ' + ISOLATION + ')')
+	print('  tests:      %d' % len(timings))
+	print('  total:      %.1f ms' % (total * 1000))
+	print('  mean:       %.1f ms' % (total / len(timings) * 1000))
+	print('  median:     %.1f ms' % (timings[len(timings) // 2] * 1000))
+	print('  max:        %.1f ms' % (timings[-1] * 1000))
+	for test_id, duration in sorted(fixture_timings.items(), key=lambda item: -item[1]):
+		print('  %8.1f ms  %s' % (duration * 1000, test_id))
+
+atexit.register(print_timing_report)
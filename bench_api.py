@@ -0,0 +1,147 @@
+# Throughput and key-lookup benchmark for /api/v1/library
+# Usage: BENCH_API_UPLOADS=100,1000,5000 BENCH_API_KEYS=500 python bench_api.py
+# Each call's time is split into API key validation (queries on the API key table), other queries,
+# JSON serialisation and everything else, and list calls report payload size and cost per item
+import os, time, unittest
+
+import flask
+from sqlalchemy import event
+
+# Flask models
+from app import db
+from app.api.models import ApiKey
+
+import helper_functions
+import benchmarks
+from benchmarks import BenchmarkCase
+from base_case import unwrap
+
+UPLOADS = [int(count) for count in os.environ.get('BENCH_API_UPLOADS', '100,1000').split(',')]
+API_KEYS = int(os.environ.get('BENCH_API_KEYS', '500'))
+REPEAT = int(os.environ.get('BENCH_REPEAT', '20'))
+
+
+# Accumulates query and serialisation time for the call being measured
+class ApiTimer:
+
+	def __init__(self, flask_app, engine):
+		self.flask_app = flask_app
+		self.engine = engine
+		self.key_table = ApiKey.__table__.name
+		self.reset()
+
+	def reset(self):
+		self.key_seconds = 0.0
+		self.query_seconds = 0.0
+		self.json_seconds = 0.0
+
+	def start(self):
+		event.listen(self.engine, 'before_cursor_execute', self.before_cursor_execute)
+		event.listen(self.engine, 'after_cursor_execute', self.after_cursor_execute)
+
+		# Flask 2.2+ serialises through app.json, older versions through flask.json.dumps
+		if hasattr(self.flask_app, 'json') and hasattr(self.flask_app.json, 'dumps'):
+			self.json_owner = self.flask_app.json
+		else:
+			self.json_owner = flask.json
+		self.original_dumps = self.json_owner.dumps
+		self.json_owner.dumps = self.timed_dumps
+		return self
+
+	def stop(self):
+		event.remove(self.engine, 'before_cursor_execute', self.before_cursor_execute)
+		event.remove(self.engine, 'after_cursor_execute', self.after_cursor_execute)
+		if self.json_owner is flask.json:
+			self.json_owner.dumps = self.original_dumps
+		else:
+			del self.json_owner.dumps
+
+	def before_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+		context.benchmark_started = time.perf_counter()
+
+	def after_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+		duration = time.perf_counter() - context.benchmark_started
+		if self.key_table in statement:
+			self.key_seconds += duration
+		else:
+			self.query_seconds += duration
+
+	def timed_dumps(self, *args, **kwargs):
+		started = time.perf_counter()
+		try:
+			return self.original_dumps(*args, **kwargs)
+		finally:
+			self.json_seconds += time.perf_counter() - started
+
+
+class ApiBenchmark(BenchmarkCase):
+
+	def timed_calls(self, timer, call):
+		breakdown = {'key_seconds': 0.0, 'query_seconds': 0.0, 'json_seconds': 0.0}
+		durations = []
+		for i in range(REPEAT):
+			timer.reset()
+			started = time.perf_counter()
+			response = call()
+			durations.append(time.perf_counter() - started)
+			self.assertEqual(response.status_code, 200)
+			payload_bytes = len(response.data)
+			response.close()
+			breakdown['key_seconds'] += timer.key_seconds
+			breakdown['query_seconds'] += timer.query_seconds
+			breakdown['json_seconds'] += timer.json_seconds
+
+		summary = benchmarks.summarise(durations)
+		summary['requests_per_second'] = REPEAT / sum(durations)
+		for name, seconds in breakdown.items():
+			summary[name] = seconds / REPEAT
+		summary['other_seconds'] = summary['mean'] - summary['key_seconds'] - summary['query_seconds'] - summary['json_seconds']
+		summary['payload_bytes'] = payload_bytes
+		return summary
+
+	def seed_library(self, uploads):
+		benchmarks.seed_library(self, uploads)
+
+		# The key the benchmark uses is the last one created, so lookups have to search past the others
+		for i in range(API_KEYS - 1):
+			helper_functions.create_api_key ()
+		return helper_functions.create_api_key ()
+
+	def test_library_api(self):
+		results = {}
+
+		for uploads in UPLOADS:
+			with benchmarks.isolated(self):
+				api_key = self.seed_library(uploads)
+				headers = {'key': api_key}
+
+				timer = ApiTimer(unwrap(self.flask_app), db.engine).start()
+				try:
+					listing = self.timed_calls(timer, lambda: self.app.get('/api/v1/library', headers = headers))
+					listing['items'] = uploads
+					listing['seconds_per_item'] = listing['mean'] / uploads
+					results['GET /api/v1/library %d' % uploads] = listing
+
+					results['GET /api/v1/library/<id> %d' % uploads] = self.timed_calls(
+						timer, lambda: self.app.get('/api/v1/library/1', headers = headers))
+
+					data = {'title': 'Edited title', 'description': 'Edited description'}
+					results['PUT /api/v1/library/<id> %d' % uploads] = self.timed_calls(
+						timer, lambda: self.app.put('/api/v1/library/1', json = data, headers = headers))
+				finally:
+					timer.stop()
+
+		for key, summary in sorted(results.items()):
+			print('%-36s %7.1f req/s  p50 %6.1f ms  p95 %6.1f ms  key %5.1f  query %5.1f  json %5.1f  other %5.1f ms  %9d B%s' % (
+				key, summary['requests_per_second'], summary['p50'] * 1000, summary['p95'] * 1000,
+				summary['key_seconds'] * 1000, summary['query_seconds'] * 1000, summary['json_seconds'] * 1000,
+				summary['other_seconds'] * 1000, summary['payload_bytes'],
+				'  %.3f ms/item' % (summary['seconds_per_item'] * 1000) if 'seconds_per_item' in summary else ''))
+
+		regressions = benchmarks.record('api_library', results, 'p95')
+		self.assertEqual(regressions, [], '\n'.join(regressions))
+
+
+if __name__ == '__main__':
+
+	unittest.main()
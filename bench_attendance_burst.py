@@ -0,0 +1,105 @@
+# Attendance check-in burst simulation
+# Usage: BENCH_BURST_STUDENTS=300 BENCH_BURST_THREADS=50 BENCH_BURST_WINDOW=60 python bench_attendance_burst.py
+# A whole lecture hall submits the attendance code at once (or spread over BENCH_BURST_WINDOW seconds)
+# Runs against the real test DB file rather than inside a rolled-back transaction, since the threads
+# need their own connections, so the schema is recreated around the run
+import os, time, random, threading, unittest
+from concurrent.futures import ThreadPoolExecutor
+
+# Flask models
+from app import db
+from app.models import User
+from app.classes.models import AttendanceCode
+
+import helper_functions
+import benchmarks
+import datasets
+from benchmarks import CommittedBenchmarkCase
+
+STUDENTS = int(os.environ.get('BENCH_BURST_STUDENTS', '300'))
+THREADS = int(os.environ.get('BENCH_BURST_THREADS', '50'))
+WINDOW = float(os.environ.get('BENCH_BURST_WINDOW', '0'))
+
+
+class AttendanceBurstBenchmark(CommittedBenchmarkCase):
+
+	# delay counts from when the gate opened, not from when a pool thread got round to this student
+	def check_in(self, student, code, start_gate, delay):
+		start_gate.wait()
+		wait = self.gate_opened + delay - time.perf_counter()
+		if wait > 0:
+			time.sleep(wait)
+		started = time.perf_counter()
+		try:
+			response = student.app.post(
+				'/classes/attendance/code/',
+				content_type='multipart/form-data',
+				data={'attendance': code},
+				follow_redirects=True)
+			error = None if response.status_code == 200 else 'HTTP %d' % response.status_code
+			checked_in = (', ' + student.username).encode() in response.data
+		except Exception as exception:
+			error, checked_in = repr(exception), False
+		return time.perf_counter() - started, checked_in, error
+
+	def test_attendance_burst(self):
+		dataset = datasets.seed_dataset(self, STUDENTS, submissions = 0, class_size = STUDENTS)
+
+		# Open attendance for the class's lesson
+		response = self.app.get('/classes/attendance/qr/1/', follow_redirects=True)
+		self.assertIn(b'The registration code is:', response.data)
+		code = AttendanceCode.query.order_by(AttendanceCode.id.desc()).first().code
+
+		usernames = [username for (username,) in db.session.query(User.username)
+			.filter(User.id.between(dataset.student_ids[0], dataset.student_ids[-1]))]
+		students = [benchmarks.Visitor(self.flask_app.test_client(), username) for username in usernames]
+		for student in students:
+			helper_functions.login(student, student.username)
+		db.session.remove()
+
+		# The first THREADS students wait at the gate so their check-ins really arrive together
+		# Students are queued in arrival order, so a free thread always picks up the next one due
+		start_gate = threading.Event()
+		arrivals = sorted((random.uniform(0, WINDOW), index) for index in range(len(students)))
+		with ThreadPoolExecutor(max_workers = THREADS) as pool:
+			futures = [pool.submit(self.check_in, students[index], code, start_gate, delay) for delay, index in arrivals]
+			started = self.gate_opened = time.perf_counter()
+			start_gate.set()
+			outcomes = [future.result() for future in futures]
+		elapsed = time.perf_counter() - started
+
+		latencies = [latency for latency, checked_in, error in outcomes]
+		errors = [error for latency, checked_in, error in outcomes if error]
+		checked_in = sum(1 for latency, success, error in outcomes if success)
+
+		# The teacher's view must count every single check-in
+		db.session.remove()
+		helper_functions.login(self, 'Patrick')
+		response = self.app.get('/classes/attendance/view/1/', follow_redirects=True)
+		exact_count = ('%d / %d' % (len(students), len(students))).encode() in response.data
+
+		summary = benchmarks.summarise(latencies)
+		summary.update({
+			'students': len(students),
+			'threads': THREADS,
+			'window_seconds': WINDOW,
+			'throughput_per_second': len(students) / elapsed,
+			'checked_in': checked_in,
+			'errors': len(errors),
+			'database_locked_errors': sum(1 for error in errors if 'database is locked' in error),
+			'exact_count': exact_count})
+		print('%d check-ins in %.2f s (%.1f/s), p50 %.1f ms  p95 %.1f ms  p99 %.1f ms, %d errors (%d locked), count exact: %s' % (
+			len(students), elapsed, summary['throughput_per_second'], summary['p50'] * 1000, summary['p95'] * 1000,
+			summary['p99'] * 1000, summary['errors'], summary['database_locked_errors'], exact_count))
+		for error in sorted(set(errors))[:10]:
+			print('  ' + error)
+
+		regressions = benchmarks.record('attendance_burst', {'check-in %d' % len(students): summary}, 'p95')
+		self.assertEqual(errors, [])
+		self.assertTrue(exact_count, 'Attendance count is not %d / %d' % (len(students), len(students)))
+		self.assertEqual(regressions, [], '\n'.join(regressions))
+
+
+if __name__ == '__main__':
+
+	unittest.main()
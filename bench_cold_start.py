@@ -0,0 +1,71 @@
+# Cold-start vs warm request latency for the major routes
+# Usage: BENCH_COLD_RUNS=3 python bench_cold_start.py
+# Each measurement runs cold_start.py in a fresh interpreter, once as the app starts today and once
+# with cold_start.prewarm run straight after create_app, and compares the first request to steady state
+# The subprocesses read the Test database, so it is seeded and committed here and dropped afterwards
+import os, sys, json, subprocess, unittest
+
+# Flask models
+from app import db
+
+import benchmarks
+from benchmarks import CommittedBenchmarkCase
+
+ROUTES = ['/', '/assignments/view', '/files/library', '/classes/admin']
+
+# Fresh interpreters per route and mode; the median run is reported
+RUNS = int(os.environ.get('BENCH_COLD_RUNS', '3'))
+
+
+def cold_start(route, prewarm = False):
+	command = [sys.executable, 'cold_start.py', route, '--user-id', '1']
+	if prewarm:
+		command.append('--prewarm')
+	output = subprocess.check_output(command, cwd = os.path.dirname(os.path.abspath(__file__)))
+	return json.loads(output.decode().strip().splitlines()[-1])
+
+# The run whose startup plus first request is the median, so one noisy run does not skew the rest
+def median_run(runs):
+	ordered = sorted(runs, key = lambda run: run['create_app(Test)'] + run.get('prewarm', 0.0) + run['first request'])
+	return ordered[len(ordered) // 2]
+
+
+class ColdStartBenchmark(CommittedBenchmarkCase):
+
+	def setUp(self):
+		super().setUp()
+		benchmarks.seed_assignment(self)
+		db.session.commit()
+		db.session.remove()
+
+	def test_cold_start(self):
+		results = {}
+		print('\n%-20s %-9s %10s %10s %10s %12s %10s %8s' % ('route', 'mode', 'import', 'create_app',
+			'prewarm', 'first req', 'steady', 'ratio'))
+		for route in ROUTES:
+			for mode in ('cold', 'prewarmed'):
+				run = median_run([cold_start(route, prewarm = mode == 'prewarmed') for i in range(RUNS)])
+				self.assertEqual(run['status'], 200, '%s returned %d' % (route, run['status']))
+				run['first / steady'] = run['first request'] / run['steady request p50'] if run['steady request p50'] else 0.0
+				# What a recycled worker's first user waits for, on top of the steady-state request
+				run['startup to first response'] = run['create_app(Test)'] + run.get('prewarm', 0.0) + run['first request']
+				results['%s %s' % (route, mode)] = run
+				print('%-20s %-9s %7.1f ms %7.1f ms %7.1f ms %9.1f ms %7.1f ms %7.1fx' % (route, mode,
+					run['import app'] * 1000, run['create_app(Test)'] * 1000, run.get('prewarm', 0.0) * 1000,
+					run['first request'] * 1000, run['steady request p50'] * 1000, run['first / steady']))
+
+		print('\nPre-warm: first request saved vs time it adds to startup')
+		for route in ROUTES:
+			cold, warm = results[route + ' cold'], results[route + ' prewarmed']
+			saved = cold['first request'] - warm['first request']
+			print('%-20s first request %+7.1f ms, prewarm %7.1f ms (%d templates), startup to first response %+7.1f ms' % (
+				route, -saved * 1000, warm['prewarm'] * 1000, warm['templates compiled'],
+				(warm['startup to first response'] - cold['startup to first response']) * 1000))
+
+		regressions = benchmarks.record('cold_start', results, 'startup to first response')
+		self.assertEqual(regressions, [], '\n'.join(regressions))
+
+
+if __name__ == '__main__':
+
+	unittest.main()
@@ -0,0 +1,67 @@
+# Leak checks for routes that have shown ResourceWarnings, replayed many times
+# Usage: LEAK_ITERATIONS=500 python bench_leaks.py
+# LOAD_PROFILE=1 samples stacks and traces requests during each soak (see load_profiler.py)
+import os, itertools, unittest
+
+# Flask models
+from app import db
+
+
+import helper_functions
+import payloads
+import benchmarks
+import leak_tracker
+import load_profiler
+from app_provider import get_app
+from profiling import safe_name
+from benchmarks import BenchmarkCase
+
+ITERATIONS = int(os.environ.get('LEAK_ITERATIONS', '200'))
+
+
+class LeakBenchmark(BenchmarkCase):
+
+	def assertNoLeaks(self, name, make_request):
+		with load_profiler.observe(get_app(), db.engine, 'soak.' + safe_name(name)):
+			samples = leak_tracker.replay(make_request, ITERATIONS)
+		print('\n' + name + '\n' + leak_tracker.report(samples))
+		found = leak_tracker.leaks(samples)
+		self.assertEqual(found, [], name + ' leaks:\n' + '\n'.join(found))
+
+	def test_upload_replace(self):
+		with benchmarks.isolated(self):
+			benchmarks.seed_assignment(self)
+			helper_functions.logout(self)
+			helper_functions.login(self, 'Pablo')
+			response = self.app.post(
+				'/files/upload/1',
+				content_type='multipart/form-data',
+				data={'file': payloads.upload('test.pdf')},
+				follow_redirects=True)
+			self.assertIn(b'submitted successfully', response.data)
+
+			# Every replacement becomes the next upload, so replace the one just made each time
+			uploads = itertools.count(1)
+			def replace():
+				response = self.app.post(
+					'/files/upload/replace/%d' % next(uploads),
+					content_type='multipart/form-data',
+					data={'file': payloads.upload('test2.pdf')},
+					follow_redirects=True)
+				self.assertIn(b'submitted successfully', response.data)
+			self.assertNoLeaks('/files/upload/replace/<id>', replace)
+
+	def test_library_download(self):
+		with benchmarks.isolated(self):
+			benchmarks.seed_library(self)
+
+			def download():
+				response = self.app.get('/files/library/download/1', follow_redirects=True)
+				self.assertEqual(response.status_code, 200)
+				response.close()
+			self.assertNoLeaks('/files/library/download/<id>', download)
+
+
+if __name__ == '__main__':
+
+	unittest.main()
@@ -0,0 +1,77 @@
+# Deadline-time load test: ramps an open-loop mix of student and teacher traffic until p95 passes a target
+# Usage: LOAD_TARGET_P95_MS=500 LOAD_DURATION=10 LOAD_STUDENTS=200 python bench_load.py
+# Runs in-process by default, or over real HTTP against a local multi-worker server with TEST_SERVER=1
+# LOAD_PROFILE=1 samples stacks and traces requests during the ramp (see load_profiler.py)
+# Like the attendance burst, the users need their own connections, so the schema is recreated around the run
+import os, unittest
+
+# Flask models
+from app import db
+from app.models import User
+from app.classes.models import AttendanceCode
+
+import helper_functions
+import benchmarks
+import datasets
+import live_server
+import load_generator
+import load_profiler
+from app_provider import get_app
+from base_case import SERVER
+from benchmarks import CommittedBenchmarkCase
+
+STUDENTS = int(os.environ.get('LOAD_STUDENTS', '200'))
+# Logged-in users sending requests at once; STUDENT_CLIENTS of the STUDENTS, and TEACHER_CLIENTS sessions for Patrick
+STUDENT_CLIENTS = int(os.environ.get('LOAD_STUDENT_CLIENTS', '40'))
+TEACHER_CLIENTS = int(os.environ.get('LOAD_TEACHER_CLIENTS', '4'))
+SUBMISSIONS = int(os.environ.get('LOAD_SUBMISSIONS', '20'))
+SEED = os.environ.get('LOAD_SEED')
+
+
+class LoadBenchmark(CommittedBenchmarkCase):
+
+	def make_client(self):
+		return live_server.LiveClient() if SERVER else self.flask_app.test_client()
+
+	def logged_in(self, username):
+		visitor = benchmarks.Visitor(self.make_client())
+		helper_functions.login(visitor, username, cached = False)
+		return visitor.app
+
+	def test_deadline_load(self):
+		dataset = datasets.seed_dataset(self, STUDENTS, submissions = SUBMISSIONS, class_size = STUDENTS)
+
+		# Open attendance for the class's lesson, so students have a code to check in with
+		response = self.app.get('/classes/attendance/qr/1/', follow_redirects=True)
+		self.assertIn(b'The registration code is:', response.data)
+		student_ids = dataset.student_ids[:STUDENT_CLIENTS]
+		usernames = [username for (username,) in db.session.query(User.username)
+			.filter(User.id.between(student_ids[0], student_ids[-1])).order_by(User.id)]
+		students = [self.logged_in(username) for username in usernames]
+		pool = load_generator.ClientPool({
+			'student': students,
+			'teacher': [self.logged_in('Patrick') for i in range(TEACHER_CLIENTS)]})
+
+		# The seeded submissions belong to the first SUBMISSIONS students, in id order
+		context = {
+			'assignment_id': 1,
+			'attendance_code': AttendanceCode.query.order_by(AttendanceCode.id.desc()).first().code,
+			'upload_ids': list(range(1, SUBMISSIONS + 1)) or [1],
+			'submitted': set(students[:SUBMISSIONS])}
+		db.session.remove()
+
+		with load_profiler.observe(get_app(), db.engine, 'load'):
+			levels = load_generator.ramp(pool, context, seed = SEED)
+		print(load_generator.report(levels))
+
+		results = {}
+		for level in levels:
+			for route in level.routes:
+				results['%s @ %.1f req/s' % (route, level.rate)] = level.summary(route)
+		results['saturation'] = load_generator.saturation_points(levels)
+		print('Results written to ' + benchmarks.write_results('load', results))
+
+
+if __name__ == '__main__':
+
+	unittest.main()
@@ -0,0 +1,38 @@
+# Per-route latency benchmark, replaying the scenario tests
+# Usage: BENCH_REPEAT=5 BENCH_THRESHOLD=1.3 python bench_routes.py
+# Fails when any route's p95 is slower than the stored baseline by more than BENCH_THRESHOLD
+import os, unittest
+
+import benchmarks
+from app_provider import get_app
+from route_timer import RouteTimer
+
+# Scenario modules that between them hit every major route
+SCENARIOS = ['test_assignments', 'test_classes', 'test_library', 'test_references', 'test_consultation']
+
+REPEAT = int(os.environ.get('BENCH_REPEAT', '3'))
+
+
+class RouteBenchmark(unittest.TestCase):
+
+	def test_route_latency(self):
+		with RouteTimer(get_app()) as timer:
+			for i in range(REPEAT):
+				# Suites drop their tests once run, so load a fresh one each time
+				scenarios = unittest.defaultTestLoader.loadTestsFromNames(SCENARIOS)
+				result = unittest.TestResult()
+				scenarios.run(result)
+				self.assertTrue(result.wasSuccessful(), result.errors + result.failures)
+
+		results = {route: benchmarks.summarise(durations) for route, durations in timer.durations.items()}
+		for route, summary in sorted(results.items(), key = lambda item: -item[1]['p95']):
+			print('%-60s n=%4d  p50 %7.1f ms  p95 %7.1f ms  p99 %7.1f ms' % (
+				route, summary['count'], summary['p50'] * 1000, summary['p95'] * 1000, summary['p99'] * 1000))
+
+		regressions = benchmarks.record('routes', results, 'p95')
+		self.assertEqual(regressions, [], '\n'.join(regressions))
+
+
+if __name__ == '__main__':
+
+	unittest.main()
@@ -0,0 +1,63 @@
+# Latency-vs-size growth curves for the pages that list students, classes and assignments
+# Usage: BENCH_SCALING_SIZES=10,100,1000,10000 python bench_scaling.py
+import os, math, time, unittest
+
+import benchmarks
+import datasets
+from benchmarks import BenchmarkCase
+
+SIZES = [int(size) for size in os.environ.get('BENCH_SCALING_SIZES', '10,100,1000').split(',')]
+REPEAT = int(os.environ.get('BENCH_REPEAT', '5'))
+
+ROUTES = ['/assignments/view', '/classes/admin', '/classes/attendance/view/1', '/user/students/manage']
+
+# A route whose latency grows faster than size ** SUPER_LINEAR is flagged
+SUPER_LINEAR = 1.1
+
+
+# Growth exponent between the smallest and largest size, i.e. latency ~ size ** exponent
+def growth_exponent(curve):
+	sizes = sorted(curve)
+	if len(sizes) < 2 or curve[sizes[0]] <= 0:
+		return 0.0
+	return math.log(curve[sizes[-1]] / curve[sizes[0]]) / math.log(sizes[-1] / sizes[0])
+
+def time_route(case, route, repeat = REPEAT):
+	durations = []
+	for i in range(repeat):
+		started = time.perf_counter()
+		response = case.app.get(route, follow_redirects=True)
+		durations.append(time.perf_counter() - started)
+		case.assertEqual(response.status_code, 200)
+	return benchmarks.summarise(durations)
+
+
+class ScalingBenchmark(BenchmarkCase):
+
+	def test_growth_curves(self):
+		results = {}
+		curves = {route: {} for route in ROUTES}
+
+		for size in SIZES:
+			with benchmarks.isolated(self):
+				datasets.seed_dataset(self, size)
+				for route in ROUTES:
+					summary = time_route(self, route)
+					results['%s %d' % (route, size)] = summary
+					curves[route][size] = summary['p50']
+
+		for route, curve in curves.items():
+			exponent = growth_exponent(curve)
+			points = '  '.join('%d: %.1f ms' % (size, curve[size] * 1000) for size in sorted(curve))
+			print('%-30s %s  (~n^%.2f)%s' % (route, points, exponent,
+				'  SUPER-LINEAR' if exponent > SUPER_LINEAR else ''))
+
+		benchmarks.write_results('scaling_curves', {route: {str(size): latency for size, latency in curve.items()}
+			for route, curve in curves.items()})
+		regressions = benchmarks.record('scaling', results, 'p50')
+		self.assertEqual(regressions, [], '\n'.join(regressions))
+
+
+if __name__ == '__main__':
+
+	unittest.main()
@@ -0,0 +1,49 @@
+# Template render time against seeded dataset size
+# Usage: BENCH_SCALING_SIZES=10,100,1000 python bench_templates.py
+# For the same pages as bench_scaling.py, shows which templates get slower as the school grows,
+# with their context size, and how much of each page's latency is rendering
+import unittest
+
+import benchmarks
+import datasets
+import bench_scaling
+from app_provider import get_app
+from benchmarks import BenchmarkCase
+from template_timer import TemplateTimer
+
+ROUTES = ['/'] + bench_scaling.ROUTES
+
+
+class TemplateBenchmark(BenchmarkCase):
+
+	def test_template_scaling(self):
+		results = {}
+		curves = {}
+
+		for size in bench_scaling.SIZES:
+			with benchmarks.isolated(self):
+				datasets.seed_dataset(self, size)
+				with TemplateTimer(get_app()) as timer:
+					for route in ROUTES:
+						bench_scaling.time_route(self, route)
+
+			for template, summary in timer.by_template().items():
+				results['%s %d' % (template, size)] = summary
+				curves.setdefault(template, {})[size] = summary
+			print('\n%d students\n%s' % (size, timer.report()))
+
+		print('\nRender time (p50) and context size by dataset size')
+		for template, curve in sorted(curves.items()):
+			exponent = bench_scaling.growth_exponent({size: summary['p50'] for size, summary in curve.items()})
+			points = '  '.join('%d: %.2f ms (ctx %d)' % (size, curve[size]['p50'] * 1000, curve[size]['max_context_size'])
+				for size in sorted(curve))
+			print('%-45s %s  (~n^%.2f)%s' % (template, points, exponent,
+				'  SUPER-LINEAR' if exponent > bench_scaling.SUPER_LINEAR else ''))
+
+		regressions = benchmarks.record('templates', results, 'p50')
+		self.assertEqual(regressions, [], '\n'.join(regressions))
+
+
+if __name__ == '__main__':
+
+	unittest.main()
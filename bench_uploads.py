@@ -0,0 +1,70 @@
+# Upload throughput and peak-memory benchmark for the file submission endpoints
+# Usage: BENCH_UPLOAD_SIZES=1K,1M,10M,100M python bench_uploads.py
+import os, unittest
+
+import helper_functions
+import payloads
+import benchmarks
+from benchmarks import BenchmarkCase
+
+SIZES = benchmarks.parse_sizes(os.environ.get('BENCH_UPLOAD_SIZES', '1K,100K,1M,10M,50M'))
+
+
+class UploadBenchmark(BenchmarkCase):
+
+	# Post one synthetic PDF, timed in the timing pass and traced in the memory pass
+	# Only the app's side of the request is traced, the test client's multipart encoding is not
+	def upload(self, url, size, measurement, memory_pass):
+		with (benchmarks.traced(self.flask_app) if memory_pass else benchmarks.timed()) as result:
+			response = self.app.post(
+				url,
+				content_type='multipart/form-data',
+				data={'file': payloads.synthetic_pdf(size)},
+				follow_redirects=True)
+		self.assertEqual(response.status_code, 200)
+		self.assertIn(b'submitted successfully', response.data)
+		response.close()
+		measurement.update(result)
+
+	# Each pass seeds its own assignment, since uploading changes what the next upload does
+	def timed_uploads(self, size):
+		measurements = {}
+		for memory_pass in (False, True):
+			# Student submission, then a replacement of that submission
+			with benchmarks.isolated(self):
+				benchmarks.seed_assignment(self)
+				helper_functions.logout(self)
+				helper_functions.login(self, 'Pablo')
+				self.upload('/files/upload/1', size, measurements.setdefault('/files/upload/<assignment_id> %d' % size, {}), memory_pass)
+				self.upload('/files/upload/replace/1', size, measurements.setdefault('/files/upload/replace/<id> %d' % size, {}), memory_pass)
+
+			# Teacher submitting on behalf of the student
+			with benchmarks.isolated(self):
+				benchmarks.seed_assignment(self)
+				self.upload('/files/upload/1/2', size, measurements.setdefault('/files/upload/<assignment_id>/<user_id> %d' % size, {}), memory_pass)
+
+		for measurement in measurements.values():
+			measurement['size_mb'] = size / 1024 ** 2
+			measurement['mb_per_second'] = measurement['size_mb'] / measurement['seconds']
+			# If the app holds the whole body in memory, its traced peak reaches the file size
+			measurement['buffered_in_memory'] = measurement['tracemalloc_peak_mb'] >= measurement['size_mb'] * 0.9
+		return measurements
+
+	def test_upload_throughput(self):
+		results = {}
+		for size in SIZES:
+			results.update(self.timed_uploads(size))
+
+		for key, measurement in sorted(results.items()):
+			print('%-50s %8.1f ms %8.1f MB/s  peak %8.1f MB  rss +%6.1f MB  peak rss %7.1f MB%s' % (
+				key, measurement['seconds'] * 1000, measurement['mb_per_second'],
+				measurement['tracemalloc_peak_mb'], measurement['rss_growth_mb'], measurement['peak_rss_mb'],
+				'  (buffered)' if measurement['buffered_in_memory'] else ''))
+
+		regressions = benchmarks.record('uploads', results, 'seconds')
+		self.assertEqual(regressions, [], '\n'.join(regressions))
+
+
+if __name__ == '__main__':
+
+	unittest.main()
@@ -0,0 +1,91 @@
+# In-process vs over-the-wire latency, and several clients against a multi-worker server
+# Usage: BENCH_REPEAT=50 TEST_SERVER_WORKERS=4 python bench_wire.py
+# The whole suite can also run over the wire with TEST_SERVER=1 python -m unittest
+import os, time, threading, unittest
+
+# Flask models
+from app import db
+
+import helper_functions
+import benchmarks
+import live_server
+from benchmarks import CommittedBenchmarkCase
+
+REPEAT = int(os.environ.get('BENCH_REPEAT', '20'))
+# One client per server worker by default: each kept-alive connection holds a worker, so any more
+# clients would queue and their wait would count as latency
+CLIENTS = int(os.environ.get('BENCH_CLIENTS', str(live_server.WORKERS)))
+
+PAGES = ['/', '/assignments/view']
+
+
+class WireBenchmark(CommittedBenchmarkCase):
+
+	# The server's workers only see committed rows, so seed for real
+	def setUp(self):
+		super().setUp()
+		benchmarks.seed_assignment(self)
+		db.session.commit()
+
+	def time_pages(self, client):
+		self.app = client
+		durations = {}
+		helper_functions.login(self, 'Patrick', cached = False)
+		for i in range(REPEAT):
+			for page in PAGES:
+				started = time.perf_counter()
+				response = client.get(page, follow_redirects=True)
+				durations.setdefault(page, []).append(time.perf_counter() - started)
+				self.assertEqual(response.status_code, 200)
+		helper_functions.logout(self)
+		return durations
+
+	def test_wire_latency(self):
+		in_process = self.time_pages(self.flask_app.test_client())
+		client = live_server.LiveClient()
+		wire = self.time_pages(client)
+		client.close()
+
+		results = {}
+		for page in PAGES:
+			results['in-process ' + page] = benchmarks.summarise(in_process[page])
+			results['wire ' + page] = benchmarks.summarise(wire[page])
+			print('%-30s in-process p50 %7.1f ms  wire p50 %7.1f ms  overhead %+7.1f ms' % (page,
+				results['in-process ' + page]['p50'] * 1000, results['wire ' + page]['p50'] * 1000,
+				(results['wire ' + page]['p50'] - results['in-process ' + page]['p50']) * 1000))
+
+		regressions = benchmarks.record('wire', results, 'p95')
+		self.assertEqual(regressions, [], '\n'.join(regressions))
+
+	# Every client keeps its own connection, so the requests spread over the server's workers
+	def test_concurrent_clients(self):
+		durations, failures = [], []
+		def browse():
+			client = live_server.LiveClient()
+			helper_functions.login(benchmarks.Visitor(client), 'Pablo', cached = False)
+			for i in range(REPEAT):
+				started = time.perf_counter()
+				response = client.get('/assignments/view')
+				durations.append(time.perf_counter() - started)
+				if response.status_code != 200:
+					failures.append(response.status_code)
+			client.close()
+
+		started = time.perf_counter()
+		threads = [threading.Thread(target = browse) for i in range(CLIENTS)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		elapsed = time.perf_counter() - started
+
+		summary = benchmarks.summarise(durations)
+		print('%d clients on %d workers: %.1f requests/s, p50 %.1f ms, p95 %.1f ms' % (CLIENTS,
+			live_server.get_server().workers, len(durations) / elapsed, summary['p50'] * 1000, summary['p95'] * 1000))
+		self.assertEqual(failures, [])
+		self.assertEqual(len(durations), CLIENTS * REPEAT)
+
+
+if __name__ == '__main__':
+
+	unittest.main()
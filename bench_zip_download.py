@@ -0,0 +1,84 @@
+# Bulk assignment ZIP download benchmark at realistic class sizes
+# Usage: BENCH_ZIP_SUBMISSIONS=100,500,1000 BENCH_ZIP_FILE_SIZE=500K python bench_zip_download.py
+# Reports time to headers, time to first byte, total time and peak memory of /assignments/download/<id>,
+# checks every submission is in the archive, and works out whether the archive was built in memory
+import os, time, tempfile, unittest, zipfile
+
+import benchmarks
+import datasets
+from benchmarks import BenchmarkCase
+
+SUBMISSIONS = [int(count) for count in os.environ.get('BENCH_ZIP_SUBMISSIONS', '100,500,1000').split(',')]
+FILE_SIZE = benchmarks.parse_sizes(os.environ.get('BENCH_ZIP_FILE_SIZE', '500K'))[0]
+
+
+# How the archive reached the client, judged from memory and timing
+def delivery_mode(measurement):
+	if measurement['tracemalloc_peak_mb'] >= measurement['archive_mb'] * 0.9:
+		return 'built in memory'
+	if measurement['ttfb_seconds'] >= measurement['seconds'] * 0.5:
+		return 'built on disk, then sent'
+	return 'streamed'
+
+
+class ZipDownloadBenchmark(BenchmarkCase):
+
+	# Download the archive without buffering it, spooling the body to a temporary file
+	def download(self, url, archive_file, measurement):
+		started = time.perf_counter()
+		response = self.app.get(url, buffered=False)
+		measurement['headers_seconds'] = time.perf_counter() - started
+		size = 0
+		try:
+			self.assertEqual(response.status_code, 200)
+			for chunk in response.response:
+				if size == 0:
+					measurement['ttfb_seconds'] = time.perf_counter() - started
+				archive_file.write(chunk)
+				size += len(chunk)
+		finally:
+			# The archive is sent from an open file, which stays open until the response is closed
+			response.close()
+		measurement['archive_mb'] = size / 1024 ** 2
+
+	# Timings come from an untraced download, memory from a second, traced one
+	def timed_download(self, url, archive_file):
+		with benchmarks.timed() as measurement:
+			self.download(url, archive_file, measurement)
+		measurement.setdefault('ttfb_seconds', measurement['seconds'])
+
+		with tempfile.TemporaryFile() as traced_file, benchmarks.traced() as memory:
+			self.download(url, traced_file, {})
+		measurement.update(memory)
+		return measurement
+
+	def test_zip_download(self):
+		results = {}
+
+		for count in SUBMISSIONS:
+			with benchmarks.isolated(self), tempfile.TemporaryFile() as archive_file:
+				datasets.seed_dataset(self, count, submissions = count, class_size = count, submission_size = FILE_SIZE)
+				measurement = self.timed_download('/assignments/download/1', archive_file)
+
+				archive_file.seek(0)
+				with zipfile.ZipFile(archive_file) as archive:
+					files = [name for name in archive.namelist() if not name.endswith('/')]
+					self.assertEqual(len(files), count)
+					self.assertIsNone(archive.testzip())
+
+				measurement['submissions'] = count
+				measurement['mode'] = delivery_mode(measurement)
+				results['/assignments/download/<id> %d' % count] = measurement
+
+		for key, measurement in sorted(results.items(), key = lambda item: item[1]['submissions']):
+			print('%-40s %8.1f MB  headers %7.2f s  ttfb %7.2f s  total %7.2f s  peak %8.1f MB  %s' % (
+				key, measurement['archive_mb'], measurement['headers_seconds'], measurement['ttfb_seconds'],
+				measurement['seconds'], measurement['tracemalloc_peak_mb'], measurement['mode']))
+
+		regressions = benchmarks.record('zip_download', results, 'seconds')
+		self.assertEqual(regressions, [], '\n'.join(regressions))
+
+
+if __name__ == '__main__':
+
+	unittest.main()
@@ -0,0 +1,252 @@
+# Shared benchmark helpers
+# Benchmarks live in bench_*.py, are run like the tests (python bench_uploads.py), and write JSON results
+# to benchmark_results/. BENCH_SAVE_BASELINE=1 stores the run as the baseline that later runs are compared
+# against, and BENCH_THRESHOLD sets how much slower (as a ratio) a measurement may get before the run fails
+import os, json, time, shutil, resource, tempfile, tracemalloc
+from contextlib import contextmanager
+
+from flask import request_started, request_finished, got_request_exception
+
+# Flask models
+from app import db
+
+import helper_functions
+from app_provider import is_upload_folder
+from stats import percentile, summarise
+from base_case import BaseTestCase, create_schema_once, unwrap
+
+RESULTS_DIR = os.environ.get('BENCH_RESULTS_DIR', 'benchmark_results')
+THRESHOLD = float(os.environ.get('BENCH_THRESHOLD', '1.25'))
+SAVE_BASELINE = os.environ.get('BENCH_SAVE_BASELINE') == '1'
+
+
+# Parse sizes such as '1K,1M,500M' into bytes
+def parse_sizes(text):
+	units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+	sizes = []
+	for size in text.split(','):
+		size = size.strip().upper()
+		if size[-1] in units:
+			sizes.append(int(float(size[:-1]) * units[size[-1]]))
+		else:
+			sizes.append(int(size))
+	return sizes
+
+
+### Memory
+# Resident set size right now, in MB
+def current_rss_mb():
+	try:
+		with open('/proc/self/statm') as statm:
+			return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+	except (OSError, ValueError):
+		return peak_rss_mb()
+
+# Highest resident set size this process has reached, in MB
+def peak_rss_mb():
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+# Time a block with nothing else running that would slow it down
+@contextmanager
+def timed():
+	measurement = {}
+	started = time.perf_counter()
+	try:
+		yield measurement
+	finally:
+		measurement['seconds'] = time.perf_counter() - started
+
+# Record the tracemalloc peak, RSS growth and peak RSS of a block
+# With flask_app, tracemalloc only runs while that app handles a request, so whatever the test client
+# allocates to encode the body is left out, and the peak is the highest any one request reached
+# Tracemalloc slows allocation-heavy code down a lot, so take timings in a separate pass with timed()
+@contextmanager
+def traced(flask_app = None):
+	measurement = {}
+	rss_before = current_rss_mb()
+	if flask_app is not None:
+		tracer = RequestTracer(unwrap(flask_app)).start()
+	else:
+		tracing = tracemalloc.is_tracing()
+		if not tracing:
+			tracemalloc.start()
+		tracemalloc.reset_peak()
+	try:
+		yield measurement
+	finally:
+		if flask_app is not None:
+			tracer.stop()
+			measurement['tracemalloc_peak_mb'] = tracer.peak / 1024 ** 2
+		else:
+			measurement['tracemalloc_peak_mb'] = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+			if not tracing:
+				tracemalloc.stop()
+		measurement['rss_growth_mb'] = current_rss_mb() - rss_before
+		# ru_maxrss is the high-water mark of the whole process so far, not of this block alone
+		measurement['peak_rss_mb'] = peak_rss_mb()
+
+# Runs tracemalloc from request_started to request_finished (or the exception) of each request
+# A streamed response body is produced after request_finished, so trace the whole block for those
+class RequestTracer:
+
+	def __init__(self, flask_app):
+		self.flask_app = flask_app
+		self.peak = 0
+		# Traced memory when the current request started, None between requests
+		self.baseline = None
+		self.owned = False
+
+	def start(self):
+		request_started.connect(self.request_started, self.flask_app)
+		request_finished.connect(self.request_finished, self.flask_app)
+		got_request_exception.connect(self.request_finished, self.flask_app)
+		return self
+
+	def stop(self):
+		request_started.disconnect(self.request_started, self.flask_app)
+		request_finished.disconnect(self.request_finished, self.flask_app)
+		got_request_exception.disconnect(self.request_finished, self.flask_app)
+		self.request_finished(self.flask_app)
+
+	# Tracing someone else started (the leak tracker's) is left running, and only its peak is reset
+	def request_started(self, sender, **extra):
+		self.owned = not tracemalloc.is_tracing()
+		if self.owned:
+			tracemalloc.start()
+		tracemalloc.reset_peak()
+		self.baseline = tracemalloc.get_traced_memory()[0]
+
+	def request_finished(self, sender, **extra):
+		if self.baseline is None:
+			return
+		self.peak = max(self.peak, tracemalloc.get_traced_memory()[1] - self.baseline)
+		self.baseline = None
+		if self.owned:
+			tracemalloc.stop()
+
+
+### Isolation
+# Benchmarks manage their own transactions with isolated(), so setUp only makes sure the schema exists
+class BenchmarkCase(BaseTestCase):
+
+	def setUp(self):
+		self.app = self.flask_app.test_client()
+		create_schema_once()
+
+	def tearDown(self):
+		pass
+
+# For benchmarks whose requests run on connections of their own (threads, server workers, subprocesses),
+# which only see committed rows: start from empty tables, and leave empty tables behind, since
+# create_schema_once will not create them again in this process
+class CommittedBenchmarkCase(BenchmarkCase):
+
+	def setUp(self):
+		self.app = self.flask_app.test_client()
+		recreate_schema()
+
+	def tearDown(self):
+		recreate_schema()
+
+def recreate_schema():
+	db.session.remove()
+	db.drop_all()
+	db.create_all()
+
+# Run a block inside its own rolled-back transaction, so one benchmark case can seed many datasets
+# Uploads go to a temporary folder that is removed afterwards, since the rollback does not undo them
+@contextmanager
+def isolated(case):
+	case.app = case.flask_app.test_client()
+	config = case.flask_app.config
+	upload_dir = tempfile.mkdtemp(prefix = 'bench-uploads-')
+	original_folders = {key: config[key] for key in config if is_upload_folder(key) and isinstance(config[key], str)}
+	for key in original_folders:
+		config[key] = os.path.join(upload_dir, key.lower())
+		os.makedirs(config[key])
+	case.begin_outer_transaction()
+	try:
+		yield case
+	finally:
+		case.rollback_outer_transaction()
+		config.update(original_folders)
+		shutil.rmtree(upload_dir, ignore_errors = True)
+
+
+### Seeding
+# A class with teacher Patrick, student Pablo and one open assignment, logged-in as Patrick
+def seed_assignment(case):
+	helper_functions.add_turma ()
+	helper_functions.register_admin_user()
+	helper_functions.add_teacher_to_class (teacher_id = 1, turma_id = 1)
+	helper_functions.add_student (case, 'Pablo')
+	helper_functions.add_peer_review_form ()
+	helper_functions.logout(case)
+	helper_functions.login(case, 'Patrick')
+	response = case.app.post(
+		'/assignments/create',
+		content_type='multipart/form-data',
+		data={
+			'title': 'Benchmark assignment',
+			'description': 'Benchmark assignment description',
+			'due_date': '2029-03-27',
+			'target_turmas': 1,
+			'peer_review_necessary': 'n',
+			'peer_review_form_id': 1,
+		},
+		follow_redirects=True)
+	case.assertIn(b'Assignment successfully created', response.data)
+	response.close()
+
+# A class with teacher Patrick and uploads library files for it, logged-in as Patrick
+def seed_library(case, uploads = 1):
+	helper_functions.add_turma ()
+	helper_functions.register_admin_user()
+	helper_functions.add_teacher_to_class (teacher_id = 1, turma_id = 1)
+	helper_functions.login(case, 'Patrick')
+	for i in range(uploads):
+		helper_functions.upload_library_file (case, 'Library upload %d' % i, 'Library upload description %d' % i)
+
+# Just enough of a test case for helper_functions.login and friends, around one client of its own
+class Visitor:
+
+	def __init__(self, client, username = None):
+		self.app = client
+		self.username = username
+
+
+### Results
+def results_path(name, suffix = ''):
+	return os.path.join(RESULTS_DIR, name + suffix + '.json')
+
+def load_results(name, suffix = ''):
+	path = results_path(name, suffix)
+	if not os.path.exists(path):
+		return None
+	with open(path) as results_file:
+		return json.load(results_file)
+
+def write_results(name, results, suffix = ''):
+	os.makedirs(RESULTS_DIR, exist_ok = True)
+	with open(results_path(name, suffix), 'w') as results_file:
+		json.dump(results, results_file, indent = 1, sort_keys = True)
+	return results_path(name, suffix)
+
+# Write the results, store them as the baseline if asked to, and list every measurement
+# whose metric got worse than the baseline by more than THRESHOLD
+def record(name, results, metric):
+	write_results(name, results)
+	baseline = load_results(name, '.baseline')
+	if SAVE_BASELINE or baseline is None:
+		write_results(name, results, '.baseline')
+		return []
+
+	regressions = []
+	for key, measurement in sorted(results.items()):
+		if key not in baseline or not baseline[key].get(metric):
+			continue
+		ratio = measurement[metric] / baseline[key][metric]
+		if ratio > THRESHOLD:
+			regressions.append('%s: %s %.4f vs baseline %.4f (%.2fx)' % (
+				key, metric, measurement[metric], baseline[key][metric], ratio))
+	return regressions
@@ -0,0 +1,164 @@
+# Scenario checkpoints
+# Saves the DB rows and upload folders at a named point of a scenario, so later stages and new tests
+# can start from there instead of replaying everything before it
+# Checkpoints are cached in .checkpoints/, keyed by a hash of the fixture code, the test module,
+# the app's model modules and the schema, so any change to those invalidates them automatically
+import os, sys, shutil, sqlite3, hashlib, inspect, tempfile
+
+from sqlalchemy.schema import CreateTable
+
+# Flask models
+from app import db
+
+import fixtures
+from app_provider import is_upload_folder
+
+CACHE_DIR = os.environ.get('TEST_CHECKPOINT_DIR', '.checkpoints')
+
+# Each checkpoint is a folder holding the DB rows and a copy of every upload folder
+DB_FILE = 'checkpoint.sqlite'
+UPLOADS_DIR = 'uploads'
+
+# Table in each checkpoint file holding what is not a DB row, e.g. the fixture sequence
+META_TABLE = '_checkpoint'
+
+# Fixture code whose behaviour shapes every checkpoint
+FIXTURE_MODULES = ['helper_functions', 'fixtures', 'datasets', 'checkpoints']
+
+
+def file_digest(path):
+	with open(path, 'rb') as source:
+		return hashlib.sha256(source.read()).hexdigest()
+
+def model_files():
+	files = set()
+	for name, module in list(sys.modules.items()):
+		if name.startswith('app.') and name.split('.')[-1] == 'models' and getattr(module, '__file__', None):
+			files.add(module.__file__)
+	return sorted(files)
+
+# Everything a checkpoint depends on, hashed into the name of its cache folder
+def cache_key(case):
+	digest = hashlib.sha256()
+	sources = [sys.modules[name].__file__ for name in FIXTURE_MODULES if name in sys.modules]
+	sources.append(inspect.getsourcefile(type(case)))
+	for path in sources + model_files():
+		digest.update(os.path.basename(path).encode() + file_digest(path).encode())
+	for table in db.metadata.sorted_tables:
+		digest.update(str(CreateTable(table).compile(db.engine)).encode())
+	return digest.hexdigest()[:16]
+
+def checkpoint_path(case, name):
+	return os.path.join(CACHE_DIR, cache_key(case), name)
+
+def upload_folders(case):
+	config = case.flask_app.config
+	return {key: config[key] for key in config
+		if is_upload_folder(key) and isinstance(config[key], str)}
+
+# Point the app's upload folders at an empty temporary folder for the rest of the test, so a checkpoint
+# only holds this test's uploads and restoring one never empties the real upload folder
+def private_uploads(case):
+	if getattr(case, 'checkpoint_uploads', None):
+		return
+	config = case.flask_app.config
+	case.checkpoint_uploads = tempfile.mkdtemp(prefix = 'checkpoint-uploads-')
+	original_folders = upload_folders(case)
+	for key in original_folders:
+		config[key] = os.path.join(case.checkpoint_uploads, key.lower())
+		os.makedirs(config[key])
+
+	def put_back():
+		for key, folder in original_folders.items():
+			if config.get(key) == os.path.join(case.checkpoint_uploads, key.lower()):
+				config[key] = folder
+		shutil.rmtree(case.checkpoint_uploads, ignore_errors = True)
+		case.checkpoint_uploads = None
+	case.addCleanup(put_back)
+
+def exists(case, name):
+	return os.path.isdir(checkpoint_path(case, name))
+
+
+# Copy every row the test can see, including its uncommitted ones, into a checkpoint folder
+# Everything is staged in a private folder and renamed into place in one step, so parallel workers
+# saving the same checkpoint never see or clobber a half-written one
+def save(case, name):
+	case.assertTrue(getattr(case, 'checkpoint_uploads', None),
+		'Call checkpoints.private_uploads before the test uploads anything it saves in a checkpoint')
+	db.session.flush()
+	path = checkpoint_path(case, name)
+	os.makedirs(os.path.dirname(path), exist_ok = True)
+	staging = tempfile.mkdtemp(prefix = name + '.', suffix = '.tmp', dir = os.path.dirname(path))
+
+	source = db.session.connection().connection.cursor()
+	snapshot = sqlite3.connect(os.path.join(staging, DB_FILE))
+	for table in db.metadata.sorted_tables:
+		rows = source.execute('SELECT * FROM "%s"' % table.name)
+		columns = [column[0] for column in rows.description]
+		snapshot.execute('CREATE TABLE "%s" (%s)' % (table.name, ', '.join('"%s"' % column for column in columns)))
+		snapshot.executemany('INSERT INTO "%s" VALUES (%s)' % (table.name, ', '.join('?' for column in columns)), rows.fetchall())
+	# Fixture numbering lives in the same file, so a checkpoint is never missing it
+	snapshot.execute('CREATE TABLE "%s" (sequence INTEGER)' % META_TABLE)
+	snapshot.execute('INSERT INTO "%s" VALUES (?)' % META_TABLE, (next(fixtures.sequence),))
+	snapshot.commit()
+	snapshot.close()
+
+	for key, folder in upload_folders(case).items():
+		if os.path.isdir(folder):
+			shutil.copytree(folder, os.path.join(staging, UPLOADS_DIR, key))
+
+	# The cache key covers everything that shapes a checkpoint, so one saved by another run is the same
+	try:
+		os.rename(staging, path)
+	except OSError:
+		if not os.path.isdir(path):
+			raise
+		shutil.rmtree(staging, ignore_errors = True)
+
+# Replace the test's rows with the checkpoint's, inside the test's transaction so tearDown still undoes it
+# Sessions are not part of a checkpoint, so log in again afterwards
+def restore(case, name):
+	path = checkpoint_path(case, name)
+	if not os.path.isdir(path):
+		return False
+
+	db.session.flush()
+	target = db.session.connection().connection.cursor()
+	snapshot = sqlite3.connect(os.path.join(path, DB_FILE))
+	for table in reversed(db.metadata.sorted_tables):
+		target.execute('DELETE FROM "%s"' % table.name)
+	for table in db.metadata.sorted_tables:
+		rows = snapshot.execute('SELECT * FROM "%s"' % table.name)
+		columns = [column[0] for column in rows.description]
+		target.executemany('INSERT INTO "%s" (%s) VALUES (%s)' % (table.name,
+			', '.join('"%s"' % column for column in columns), ', '.join('?' for column in columns)), rows.fetchall())
+	sequence = snapshot.execute('SELECT sequence FROM "%s"' % META_TABLE).fetchone()[0]
+	snapshot.close()
+	db.session.expire_all()
+
+	# Uploads written after the checkpoint must go too, so empty each (private) folder before copying it back
+	private_uploads(case)
+	for key, folder in upload_folders(case).items():
+		shutil.rmtree(folder, ignore_errors = True)
+		source = os.path.join(path, UPLOADS_DIR, key)
+		if os.path.isdir(source):
+			shutil.copytree(source, folder)
+		else:
+			os.makedirs(folder, exist_ok = True)
+
+	# Carry on numbering fixtures after the checkpoint, so generated emails and numbers stay unique
+	current = next(fixtures.sequence)
+	if current < sequence:
+		for i in range(sequence - current):
+			next(fixtures.sequence)
+	return True
+
+# Restore a checkpoint, building it first with build() when it is not cached yet
+# build() is expected to call save(case, name) at the point to resume from
+def resume(case, name, build):
+	private_uploads(case)
+	if restore(case, name):
+		return
+	build()
+	case.assertTrue(restore(case, name), 'Building the checkpoint did not save %s' % name)
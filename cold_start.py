@@ -0,0 +1,74 @@
+# Cold-start measurements, run in a fresh interpreter by bench_cold_start.py
+# Only the standard library is imported at module level, so importing the app is part of what is timed
+# Usage: python cold_start.py /assignments/view [--prewarm] [--repeat N] prints the timings as JSON
+import sys, json, time, argparse
+
+
+# Touch what the first request would otherwise pay for: configure every SQLAlchemy mapper and
+# compile every Jinja template into the environment's cache
+# Call it at the end of create_app (or from the WSGI entry point) to warm a worker before it serves
+def prewarm(flask_app):
+	from sqlalchemy.orm import configure_mappers
+	configure_mappers()
+	compiled = 0
+	with flask_app.app_context():
+		for name in flask_app.jinja_env.list_templates():
+			if name.endswith(('.html', '.txt', '.xml')):
+				flask_app.jinja_env.get_template(name)
+				compiled += 1
+	return compiled
+
+
+def median(values):
+	ordered = sorted(values)
+	return ordered[len(ordered) // 2] if ordered else 0.0
+
+# Time the app import, create_app(Test), an optional pre-warm, the first request to route and then
+# repeat more requests to it, as user_id, whose session is written straight into the cookie so
+# logging in does not warm anything first
+def measure(route, user_id = 1, prewarmed = False, repeat = 20):
+	timings = {}
+
+	started = time.perf_counter()
+	import app
+	import config
+	timings['import app'] = time.perf_counter() - started
+
+	from app import create_app
+	started = time.perf_counter()
+	flask_app = create_app(config.Test)
+	timings['create_app(Test)'] = time.perf_counter() - started
+
+	if prewarmed:
+		started = time.perf_counter()
+		timings['templates compiled'] = prewarm(flask_app)
+		timings['prewarm'] = time.perf_counter() - started
+
+	client = flask_app.test_client()
+	with client.session_transaction() as session:
+		session['_user_id'] = str(user_id)
+		session['_fresh'] = True
+
+	started = time.perf_counter()
+	response = client.get(route, follow_redirects=True)
+	timings['first request'] = time.perf_counter() - started
+	timings['status'] = response.status_code
+
+	durations = []
+	for i in range(repeat):
+		started = time.perf_counter()
+		client.get(route, follow_redirects=True)
+		durations.append(time.perf_counter() - started)
+	timings['steady request p50'] = median(durations)
+	return timings
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description = 'Time create_app and the first request to a route in this process')
+	parser.add_argument('route')
+	parser.add_argument('--user-id', type = int, default = 1)
+	parser.add_argument('--prewarm', action = 'store_true')
+	parser.add_argument('--repeat', type = int, default = 20)
+	args = parser.parse_args()
+	print(json.dumps(measure(args.route, args.user_id, args.prewarm, args.repeat)))
+	sys.exit(0)
@@ -0,0 +1,93 @@
+# Scaling dataset seeder
+# Builds a realistic school of a given size on top of the bulk fixture factory: one teacher (Patrick)
+# managing every class, students spread evenly over classes of CLASS_SIZE, one assignment and one
+# lesson per class, and some submissions to the first assignment
+import os, math
+
+from app.models import Enrollment
+
+import fixtures
+import helper_functions
+import payloads
+
+CLASS_SIZE = int(os.environ.get('BENCH_CLASS_SIZE', '50'))
+
+
+class Dataset:
+
+	def __init__(self, students, teacher_id, student_ids, turma_ids):
+		self.students = students
+		self.teacher_id = teacher_id
+		self.student_ids = student_ids
+		self.turma_ids = turma_ids
+
+	# Students of one class, in the order they were enrolled
+	def class_students(self, turma_id):
+		index = self.turma_ids.index(turma_id)
+		return self.student_ids[index::len(self.turma_ids)]
+
+
+# Seed the DB and leave the case's client logged-in as Patrick
+# Submissions use test.pdf, or synthetic PDFs of submission_size bytes when given
+def seed_dataset(case, students, submissions = 20, class_size = CLASS_SIZE, submission_size = None):
+	teacher_id = fixtures.create_admins(1, usernames = ['Patrick'])[0]
+	turma_ids = fixtures.create_turmas(max(1, math.ceil(students / class_size)))
+	fixtures.assign_teachers([teacher_id], turma_ids)
+	student_ids = fixtures.create_users(students)
+
+	# Round-robin, so every class gets the same number of students
+	fixtures.bulk_insert(Enrollment, [{'user_id': student_id, 'turma_id': turma_ids[index % len(turma_ids)]}
+		for index, student_id in enumerate(student_ids)])
+
+	dataset = Dataset(students, teacher_id, student_ids, turma_ids)
+
+	helper_functions.add_peer_review_form ()
+	helper_functions.login(case, 'Patrick')
+	for turma_id in turma_ids:
+		create_assignment(case, turma_id)
+		create_lesson(case, turma_id)
+
+	# Teacher submits on behalf of the first students of the first class
+	for student_id in dataset.class_students(turma_ids[0])[:submissions]:
+		if submission_size:
+			upload = payloads.synthetic_pdf(submission_size, 'submission.pdf')
+		else:
+			upload = payloads.upload('test.pdf')
+		response = case.app.post(
+			'/files/upload/1/%d' % student_id,
+			content_type='multipart/form-data',
+			data={'file': upload},
+			follow_redirects=True)
+		case.assertIn(b'submitted successfully', response.data)
+		response.close()
+
+	return dataset
+
+def create_assignment(case, turma_id):
+	response = case.app.post(
+		'/assignments/create',
+		content_type='multipart/form-data',
+		data={
+			'title': 'Assignment for class %d' % turma_id,
+			'description': 'Dataset assignment description',
+			'due_date': '2029-03-27',
+			'target_turmas': turma_id,
+			'peer_review_necessary': 'n',
+			'peer_review_form_id': 1,
+		},
+		follow_redirects=True)
+	case.assertIn(b'Assignment successfully created', response.data)
+	response.close()
+
+def create_lesson(case, turma_id):
+	response = case.app.post(
+		'/classes/lesson/create/%d' % turma_id,
+		content_type='multipart/form-data',
+		data={
+			'start_time': '10:00',
+			'end_time': '11:30',
+			'date': '2020-06-10'
+		},
+		follow_redirects=True)
+	case.assertIn(b'New lesson added for', response.data)
+	response.close()
@@ -0,0 +1,207 @@
+# Persistent duration history for tests and the requests they make
+# With TEST_HISTORY=1, every test run by BaseTestCase stores its duration and outcome, and its per-route
+# request times, in a local SQLite database (.test_history.sqlite), one run per process or per
+# run_parallel invocation. run_parallel.py and run_impacted.py record unless TEST_HISTORY=0
+# The history gives run_parallel its expected durations, and `python duration_history.py report` flags
+# tests and routes that got significantly slower than their rolling baseline, keeping noisy ones apart
+import os, sys, math, atexit, sqlite3, argparse, datetime
+from contextlib import contextmanager
+
+ENABLED = os.environ.get('TEST_HISTORY') == '1'
+HISTORY_FILE = os.environ.get('TEST_HISTORY_FILE', '.test_history.sqlite')
+
+# Runs the latest runs are compared against, and how many latest runs make up one measurement
+WINDOW = int(os.environ.get('TEST_HISTORY_WINDOW', '20'))
+RECENT = int(os.environ.get('TEST_HISTORY_RECENT', '3'))
+# One-sided Mann-Whitney p-value below which the recent runs count as slower
+SIGNIFICANCE = 0.01
+# Slowdowns smaller than this ratio are not worth reporting, however consistent
+MIN_RATIO = 1.1
+# Relative spread (scaled MAD / median) above which a test's timing is too noisy to trust
+NOISY_SPREAD = 0.25
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, started TEXT, label TEXT);
+CREATE TABLE IF NOT EXISTS tests (run_id INTEGER, test_id TEXT, outcome TEXT, duration REAL);
+CREATE TABLE IF NOT EXISTS requests (run_id INTEGER, test_id TEXT, route TEXT, count INTEGER, total REAL);
+CREATE INDEX IF NOT EXISTS tests_by_id ON tests (test_id, run_id);
+CREATE INDEX IF NOT EXISTS requests_by_test ON requests (test_id, route, run_id);
+'''
+
+# This process's run, created on the first record; run_parallel hands its own to the workers
+current_run = int(os.environ['TEST_HISTORY_RUN']) if os.environ.get('TEST_HISTORY_RUN') else None
+
+# The connection tests are recorded on, opened by the first record and kept for the whole process
+recorder = None
+
+
+# The runners order and shard tests by the history, so they record unless TEST_HISTORY=0
+# Workers started afterwards inherit the setting
+def enable_for_runner():
+	global ENABLED
+	ENABLED = os.environ.get('TEST_HISTORY', '1') != '0'
+	if ENABLED:
+		os.environ['TEST_HISTORY'] = '1'
+	return ENABLED
+
+# A committed and closed connection per use, for reports and runners
+@contextmanager
+def connect(path = HISTORY_FILE):
+	connection = sqlite3.connect(path, timeout = 30)
+	try:
+		connection.executescript(SCHEMA)
+		with connection:
+			yield connection
+	finally:
+		connection.close()
+
+def close_recorder():
+	if recorder is not None:
+		recorder.close()
+
+atexit.register(close_recorder)
+
+def start_run(label = None):
+	with connect() as connection:
+		cursor = connection.execute('INSERT INTO runs (started, label) VALUES (?, ?)',
+			(datetime.datetime.now().isoformat(timespec = 'seconds'), label or ' '.join(sys.argv)))
+		return cursor.lastrowid
+
+# Store one test's duration and outcome, and {route: [seconds, ...]} of the requests it made
+# Each test is committed straight away, so parallel workers only hold the write lock briefly
+def record(test_id, duration, outcome, request_durations = None):
+	global current_run, recorder
+	if not ENABLED:
+		return
+	if current_run is None:
+		current_run = start_run()
+	if recorder is None:
+		recorder = sqlite3.connect(HISTORY_FILE, timeout = 30)
+		recorder.executescript(SCHEMA)
+	with recorder:
+		recorder.execute('INSERT INTO tests VALUES (?, ?, ?, ?)', (current_run, test_id, outcome, duration))
+		recorder.executemany('INSERT INTO requests VALUES (?, ?, ?, ?, ?)', [
+			(current_run, test_id, route, len(durations), sum(durations))
+			for route, durations in (request_durations or {}).items()])
+
+
+### Expected durations, for ordering and sharding
+# Median duration of each test over its last WINDOW passing runs
+def expected_durations(window = WINDOW):
+	if not os.path.exists(HISTORY_FILE):
+		return {}
+	durations = {}
+	with connect() as connection:
+		for test_id, duration in connection.execute(
+				"SELECT test_id, duration FROM tests WHERE outcome = 'passed' ORDER BY test_id, run_id DESC"):
+			durations.setdefault(test_id, [])
+			if len(durations[test_id]) < window:
+				durations[test_id].append(duration)
+	return {test_id: median(values) for test_id, values in durations.items()}
+
+# Tests that failed in their latest run first, for fast feedback, then the quickest first
+def order(test_ids):
+	expected = expected_durations()
+	failed = set()
+	if os.path.exists(HISTORY_FILE):
+		with connect() as connection:
+			failed = set(test_id for test_id, outcome in connection.execute(
+				'SELECT test_id, outcome FROM tests WHERE rowid IN (SELECT MAX(rowid) FROM tests GROUP BY test_id)')
+				if outcome in ('failed', 'error'))
+	return sorted(test_ids, key = lambda test_id: (test_id not in failed, expected.get(test_id, 0.0)))
+
+
+### Statistics
+def median(values):
+	ordered = sorted(values)
+	middle = len(ordered) // 2
+	return ordered[middle] if len(ordered) % 2 else (ordered[middle - 1] + ordered[middle]) / 2
+
+# Median absolute deviation scaled to match a standard deviation, relative to the median
+def spread(values):
+	centre = median(values)
+	if not centre:
+		return 0.0
+	return 1.4826 * median([abs(value - centre) for value in values]) / centre
+
+# One-sided Mann-Whitney U test that recent is larger than baseline, with the normal approximation
+def p_slower(baseline, recent):
+	u = 0.0
+	for value in recent:
+		for reference in baseline:
+			u += 1.0 if value > reference else 0.5 if value == reference else 0.0
+	n1, n2 = len(recent), len(baseline)
+	mean = n1 * n2 / 2.0
+	deviation = math.sqrt(n1 * n2 * (n1 + n2 + 1) / 12.0)
+	if not deviation:
+		return 1.0
+	z = (u - mean) / deviation
+	return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+class Finding:
+
+	def __init__(self, name, baseline, recent, outcomes):
+		self.name = name
+		self.baseline = median(baseline)
+		self.recent = median(recent)
+		self.ratio = self.recent / self.baseline if self.baseline else 0.0
+		self.p_value = p_slower(baseline, recent)
+		self.spread = spread(baseline)
+		self.flaky = len(set(outcomes)) > 1
+
+	def slower(self):
+		return self.p_value < SIGNIFICANCE and self.ratio >= MIN_RATIO
+
+	def noisy(self):
+		return self.flaky or self.spread > NOISY_SPREAD
+
+	def describe(self):
+		return '%-70s %8.1f ms -> %8.1f ms (%.2fx, p=%.3f, spread %.0f%%%s)' % (self.name, self.baseline * 1000,
+			self.recent * 1000, self.ratio, self.p_value, self.spread * 100, ', flaky' if self.flaky else '')
+
+# Split each series (oldest first) into its baseline window and its most recent runs
+def compare(name, series, outcomes = (), window = WINDOW, recent = RECENT):
+	if len(series) < recent + 3:
+		return None
+	return Finding(name, series[-(window + recent):-recent], series[-recent:], list(outcomes)[-(window + recent):])
+
+def findings(window = WINDOW, recent = RECENT):
+	tests, outcomes, requests = {}, {}, {}
+	with connect() as connection:
+		for test_id, outcome, duration in connection.execute('SELECT test_id, outcome, duration FROM tests ORDER BY run_id'):
+			outcomes.setdefault(test_id, []).append(outcome)
+			if outcome == 'passed':
+				tests.setdefault(test_id, []).append(duration)
+		for test_id, route, count, total in connection.execute(
+				'SELECT test_id, route, count, total FROM requests ORDER BY run_id'):
+			requests.setdefault('%s  %s' % (test_id, route), []).append(total / count)
+
+	found = [compare(test_id, series, outcomes[test_id], window, recent) for test_id, series in tests.items()]
+	found += [compare(name, series, (), window, recent) for name, series in requests.items()]
+	return [finding for finding in found if finding is not None]
+
+def report(window = WINDOW, recent = RECENT):
+	found = findings(window, recent)
+	regressions = [finding for finding in found if finding.slower() and not finding.noisy()]
+	noisy_slower = [finding for finding in found if finding.slower() and finding.noisy()]
+	noisy = [finding for finding in found if finding.noisy() and not finding.slower()]
+
+	print('Median of the last %d runs against the %d before them' % (recent, window))
+	for title, group in (('Slowdowns', regressions), ('Slower, but too noisy to be sure', noisy_slower),
+			('Noisy or flaky', noisy)):
+		print('=' * 70)
+		print('%s (%d)' % (title, len(group)))
+		print('=' * 70)
+		for finding in sorted(group, key = lambda finding: -finding.ratio):
+			print(finding.describe())
+	return regressions
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description = 'Report tests and requests that got slower across runs')
+	parser.add_argument('command', choices = ['report'])
+	parser.add_argument('--window', type = int, default = WINDOW, help = 'Baseline runs to compare against')
+	parser.add_argument('--recent', type = int, default = RECENT, help = 'Latest runs that make up the measurement')
+	args = parser.parse_args()
+	sys.exit(1 if report(args.window, args.recent) else 0)
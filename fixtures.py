@@ -0,0 +1,113 @@
+# Bulk fixture factory
+# Creates large numbers of users, classes, teacher assignments and peer review forms
+# with one bulk insert and one commit per call, returning the ids of the users and classes
+import os, itertools
+
+# Flask 
+from config import Test
+from werkzeug.security import generate_password_hash
+
+# Flask models
+from app import db
+from app.models import User, Turma, PeerReviewForm, Enrollment
+from app.classes.models import ClassManagement
+
+# Shared counter so every generated email, student number and class label is unique in this process
+sequence = itertools.count(1)
+
+# Hashing cost for fixture users, taken from Test.PASSWORD_HASH_METHOD or TEST_PASSWORD_HASH_METHOD
+# check_password_hash reads the method back out of the hash, so logging in stays cheap too
+PASSWORD_HASH_METHOD = getattr(Test, 'PASSWORD_HASH_METHOD', None) or os.environ.get('TEST_PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1')
+
+# One precomputed hash per distinct password
+password_hashes = {}
+
+PEER_REVIEW_FORM_DATA = '{"title": "Teacher Feedback", "description": "Peer Review Form Description", "fields": [{"title": "Feedback", "type": "element-paragraph-text", "required": false, "position": 1}]}'
+
+
+# Host parameters per SELECT, under SQLite's historical limit of 999
+SELECT_CHUNK = 900
+
+# Insert the rows without building ORM objects in one executemany, and commit once
+# With key, a column unique to each row, their ids are read back by that key and returned in row order
+# (return_defaults would make SQLAlchemy insert one row at a time to fetch each primary key)
+def bulk_insert(model, rows, key = None):
+	if rows:
+		db.session.bulk_insert_mappings(model, rows)
+	if key is None:
+		db.session.commit()
+		return None
+	column = getattr(model, key)
+	values = [row[key] for row in rows]
+	ids = {}
+	for start in range(0, len(values), SELECT_CHUNK):
+		ids.update(db.session.query(column, model.id).filter(column.in_(values[start:start + SELECT_CHUNK])))
+	db.session.commit()
+	return [ids[value] for value in values]
+
+# Hash each distinct password once per process and reuse it for every fixture user
+# Tests that need the app's real hashing should call User.set_password instead
+def password_hash_for(password):
+	if password not in password_hashes:
+		password_hashes[password] = generate_password_hash(password, method = PASSWORD_HASH_METHOD)
+	return password_hashes[password]
+
+
+### Users
+# Create confirmed users called <prefix><n>, e.g. student1, student2...
+def create_users(count, prefix = 'student', password = 'test', is_admin = False, usernames = None):
+	password_hash = password_hash_for(password)
+	if usernames is None:
+		numbers = [next(sequence) for i in range(count)]
+		usernames = [prefix + str(number) for number in numbers]
+	else:
+		numbers = [next(sequence) for username in usernames]
+
+	rows = []
+	for username, number in zip(usernames, numbers):
+		rows.append({
+			'username': username,
+			'email': '%s.%d@mailinator.com' % (username.lower(), number),
+			'student_number': '%08d' % number,
+			'password_hash': password_hash,
+			'email_confirmed': True,
+			'is_admin': is_admin,
+			'is_superintendant': is_admin})
+	return bulk_insert(User, rows, key = 'email')
+
+def create_admins(count, prefix = 'teacher', password = 'test', usernames = None):
+	return create_users(count, prefix, password, is_admin = True, usernames = usernames)
+
+
+### Classes
+def create_turmas(count, term = 'Fall', year = '2020'):
+	rows = []
+	for i in range(count):
+		number = next(sequence)
+		rows.append({
+			'turma_number': '%08d' % number,
+			'turma_label': 'Writing %d' % number,
+			'turma_term': term,
+			'turma_year': year})
+	return bulk_insert(Turma, rows, key = 'turma_number')
+
+# Enrol every student in every class
+def enrol_students(student_ids, turma_ids):
+	rows = [{'user_id': student_id, 'turma_id': turma_id}
+		for student_id in student_ids for turma_id in turma_ids]
+	bulk_insert(Enrollment, rows)
+
+# Make every teacher a manager of every class
+def assign_teachers(teacher_ids, turma_ids):
+	rows = [{'user_id': teacher_id, 'turma_id': turma_id}
+		for teacher_id in teacher_ids for turma_id in turma_ids]
+	bulk_insert(ClassManagement, rows)
+
+
+### Peer review forms
+def create_peer_review_forms(count, title = 'Teacher Feedback'):
+	rows = [{
+		'title': title,
+		'description': 'Peer Review Form Description',
+		'serialised_form_data': PEER_REVIEW_FORM_DATA} for i in range(count)]
+	bulk_insert(PeerReviewForm, rows)
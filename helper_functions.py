@@ -2,19 +2,15 @@
 from io import BytesIO, StringIO
 import os, unittest, warnings, string, random, secrets
 
-# Flask 
-from app import create_app
-from flask import url_for
-from config import basedir
-from config import Test
-app = create_app(Test)
-
 # Flask models
 from app import db
-from app.models import User, Turma, LibraryUpload, PeerReviewForm
+from app.models import User, Turma, PeerReviewForm, Enrollment
 from app.classes.models import ClassManagement
 from app.api import models
-from app.api.models import ApiKey
+from app_provider import app
+
+import fixtures
+import payloads
 
 # Set the test DB
 TEST_DB = 'test.db'
@@ -22,8 +18,32 @@ TEST_DB = 'test.db'
 
 ### Generic helper functions
 # Function to log-in
-def login(self, username, password = 'test'):
-	return self.app.post('/user/login', data=dict(username=username, password=password), follow_redirects=True)
+# The first successful log-in for each user is captured per test client, together with the page it
+# landed on. Later log-ins swap that session back in instead of posting to /user/login again, and
+# return that landing page fetched with the restored session, so callers get a response either way
+# Pass cached = False, or set TEST_LOGIN_CACHE=0, to always go through the log-in page
+def login(self, username, password = 'test', cached = True):
+	cached = cached and os.environ.get('TEST_LOGIN_CACHE', '1') != '0'
+	if not hasattr(self.app, 'session_cache'):
+		self.app.session_cache = {}
+	session_cache = self.app.session_cache
+	
+	if cached and (username, password) in session_cache:
+		saved_session, landing_page = session_cache[(username, password)]
+		with self.app.session_transaction() as session:
+			session.clear()
+			session.update(saved_session)
+		return self.app.get(landing_page, follow_redirects=True)
+	
+	response = self.app.post('/user/login', data=dict(username=username, password=password), follow_redirects=True)
+	
+	# Only keep sessions that actually authenticated the user
+	# The test client tells where the redirects ended, a LiveClient response does not
+	with self.app.session_transaction() as session:
+		if '_user_id' in session:
+			landing_page = getattr(getattr(response, 'request', None), 'path', None) or '/'
+			session_cache[(username, password)] = (dict(session), landing_page)
+	return response
 
 # Function to log-out
 def logout(self):
@@ -34,7 +54,7 @@ def register_admin_user (username = 'Patrick'):
 	random_email = ''.join(random.choice(string.ascii_lowercase) for i in range(8))
 	random_student_number = ''.join(str(random.randint(1,9)) for i in range(8))
 	admin_user = User(username=username, email=random_email, student_number=random_student_number, email_confirmed = 1, is_admin = 1, is_superintendant = 1)
-	admin_user.set_password('test')
+	admin_user.password_hash = fixtures.password_hash_for('test')
 	db.session.add(admin_user)
 	db.session.commit()
 	
@@ -73,7 +93,7 @@ def register_student(self, username, password = 'test', confirm_email = True, ):
 	self.assertIn(b'An email has been sent', response.data)
 	
 	# Test the user email validation check
-	response = login(self, username, 'test')
+	response = login(self, username, 'test', cached = False)
 	self.assertEqual(response.status_code, 200)
 	self.assertIn(b'Please click the confirmation link', response.data)
 	
@@ -84,31 +104,69 @@ def register_student(self, username, password = 'test', confirm_email = True, ):
 		db.session.commit()
 		
 		# Check that the user can now log-in properly
-		response = login(self, username, 'test')
+		response = login(self, username, 'test', cached = False)
 		self.assertEqual(response.status_code, 200)
 			
 	else:
 		pass
 
-# Add a class 
-def add_turma ():
-	random_turma_number = ''.join(str(random.randint(1,9)) for i in range(8))
-	random_turma_label = 'Writing ' + str(random.randint(1,9))
-	turma = Turma(turma_number = random_turma_number, turma_label = random_turma_label, turma_term = 'Fall', turma_year = '2020')
+# Create a student directly in the DB, skipping the five requests of the signup flow
+# Mirrors register_student: the sign-up code must be valid, the student is enrolled in target_turmas,
+# and a confirmed student is left logged-in
+# Use register_student for tests of the registration pages themselves
+def add_student(self, username, password = 'test', confirm_email = True, target_turmas = 1, sign_up_code = 'testsignup'):
+	assert sign_up_code in app.config['SIGNUP_CODES']
+	if isinstance(target_turmas, int):
+		target_turmas = [target_turmas]
 	
-	db.session.add(turma)
+	number = next(fixtures.sequence)
+	student = User(username = username,
+				   email = '%s.%d@mailinator.com' % (username.lower(), number),
+				   student_number = '%08d' % number,
+				   email_confirmed = confirm_email)
+	student.password_hash = fixtures.password_hash_for(password)
+	db.session.add(student)
+	db.session.flush()
+	
+	for turma_id in target_turmas:
+		db.session.add(Enrollment(user_id = student.id, turma_id = turma_id))
 	db.session.commit()
 	
-	new_turma = db.session.query(Turma).filter_by(turma_label=random_turma_label).first()
+	if confirm_email == True:
+		response = login(self, username, password, cached = False)
+		self.assertEqual(response.status_code, 200)
+	
+	return student.id
+
+# Add a class 
+def add_turma ():
+	turma_id = fixtures.create_turmas(1)[0]
+	
+	new_turma = Turma.query.get(turma_id)
 	assert new_turma.turma_term == 'Fall'
 	assert new_turma.turma_year != '2019'
 
 	#¡# Add a shim to ensure that each turma gets added as belonging to all administrators
 	#¡# This should be removed and a proper testing mechanism put into place that manualyl enables this and tests it
-	for user in User.query.all():
-		new_management = ClassManagement (user_id = user.id, turma_id = new_turma.id)
-		db.session.add(new_management)
-		db.session.commit
+	user_ids = [user_id for (user_id,) in db.session.query(User.id)]
+	fixtures.assign_teachers(user_ids, [turma_id])
+
+# Upload test.pdf to the library for a class, as the logged-in teacher
+def upload_library_file (self, title = 'Test library upload', description = 'Test library upload description', target_turmas = 1):
+	response = self.app.post(
+		'/files/library/upload/',
+		content_type='multipart/form-data', 
+		data={
+			'library_upload_file': payloads.upload('test.pdf'),
+			'title': title,
+			'description': description,
+			'target_turmas': target_turmas
+			},
+		follow_redirects=True)
+	self.assertEqual(response.status_code, 200)
+	self.assertIn(b'New file successfully added to the library!', response.data)
+	response.close()
+	return response
 
 # Add a peer review form
 def add_peer_review_form ():
@@ -116,7 +174,7 @@ def add_peer_review_form ():
 	peer_review_form = PeerReviewForm (
 		title = 'Teacher Feedback',
 		description = 'Peer Review Form Description',
-		serialised_form_data = '{"title": "Teacher Feedback", "description": "Peer Review Form Description", "fields": [{"title": "Feedback", "type": "element-paragraph-text", "required": false, "position": 1}]}'
+		serialised_form_data = fixtures.PEER_REVIEW_FORM_DATA
 	)
 	
 	db.session.add(peer_review_form)
@@ -0,0 +1,79 @@
+# Memory and resource-leak tracker for repeated requests
+# Replays one request many times and samples traced memory, open file descriptors, live SQLAlchemy
+# sessions and ResourceWarnings between iterations. After a warm-up, anything that still keeps growing
+# through the second half of the run is reported as a leak
+import gc, os, warnings, tracemalloc
+
+from sqlalchemy.orm import session as orm_session
+
+# Allowed growth per iteration over the second half of the run
+MEMORY_BYTES_PER_ITERATION = int(os.environ.get('LEAK_MEMORY_BYTES_PER_ITERATION', '2048'))
+
+
+def open_file_descriptors():
+	for folder in ('/proc/self/fd', '/dev/fd'):
+		if os.path.isdir(folder):
+			return len(os.listdir(folder))
+	return 0
+
+# Sessions that have not been garbage collected yet
+def live_sessions():
+	return len(orm_session._sessions)
+
+
+class Sample:
+
+	def __init__(self, iteration, resource_warnings):
+		gc.collect()
+		self.iteration = iteration
+		self.memory = tracemalloc.get_traced_memory()[0]
+		self.file_descriptors = open_file_descriptors()
+		self.sessions = live_sessions()
+		self.resource_warnings = resource_warnings
+
+
+# Call make_request() iterations times, sampling every sample_every iterations, and return the samples
+def replay(make_request, iterations = 200, warmup = 20, sample_every = 10):
+	tracing = tracemalloc.is_tracing()
+	if not tracing:
+		tracemalloc.start()
+	samples = []
+	try:
+		with warnings.catch_warnings(record = True) as caught:
+			warnings.simplefilter('always', ResourceWarning)
+			for iteration in range(1, warmup + iterations + 1):
+				make_request()
+				if iteration > warmup and (iteration - warmup) % sample_every == 0:
+					resource_warnings = sum(1 for warning in caught if issubclass(warning.category, ResourceWarning))
+					samples.append(Sample(iteration - warmup, resource_warnings))
+	finally:
+		if not tracing:
+			tracemalloc.stop()
+	return samples
+
+# Everything that grew through the second half of the run, as human readable lines
+def leaks(samples, memory_bytes_per_iteration = MEMORY_BYTES_PER_ITERATION):
+	if len(samples) < 2:
+		return []
+	middle, last = samples[len(samples) // 2], samples[-1]
+	iterations = last.iteration - middle.iteration
+
+	found = []
+	memory_growth = (last.memory - middle.memory) / iterations
+	if memory_growth > memory_bytes_per_iteration:
+		found.append('traced memory grows %.0f bytes per iteration' % memory_growth)
+	if last.file_descriptors > middle.file_descriptors:
+		found.append('open file descriptors grew from %d to %d' % (middle.file_descriptors, last.file_descriptors))
+	if last.sessions > middle.sessions:
+		found.append('live SQLAlchemy sessions grew from %d to %d' % (middle.sessions, last.sessions))
+	if last.resource_warnings > middle.resource_warnings:
+		found.append('%d ResourceWarnings (e.g. unclosed files) over %d iterations' % (
+			last.resource_warnings - middle.resource_warnings, iterations))
+	return found
+
+def report(samples):
+	lines = ['%9s %12s %6s %9s %9s' % ('iteration', 'memory KB', 'fds', 'sessions', 'warnings')]
+	for sample in samples:
+		lines.append('%9d %12.1f %6d %9d %9d' % (sample.iteration, sample.memory / 1024,
+			sample.file_descriptors, sample.sessions, sample.resource_warnings))
+	return '\n'.join(lines)
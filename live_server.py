@@ -0,0 +1,193 @@
+# Real multi-worker WSGI server mode
+# TEST_SERVER=1 runs the whole suite against create_app(Test) served by a local werkzeug server, with
+# TEST_SERVER_WORKERS forked worker processes, over real HTTP with keep-alive connections
+# LiveClient mirrors the parts of Flask's test client the tests use, including session_transaction,
+# so helper_functions (login, uploads and the session cache) work unchanged over the wire
+import os, json, time, socket, multiprocessing
+import http.client
+from contextlib import contextmanager
+from http.cookies import SimpleCookie
+from urllib.parse import urljoin, urlsplit
+
+from werkzeug.serving import make_server, WSGIRequestHandler
+from werkzeug.test import EnvironBuilder
+
+# Flask models
+from app import db
+
+from app_provider import get_app
+
+WORKERS = int(os.environ.get('TEST_SERVER_WORKERS', '4'))
+# Seconds a worker waits on an idle kept-alive connection before closing it and becoming free again
+IDLE_TIMEOUT = float(os.environ.get('TEST_SERVER_IDLE_TIMEOUT', '5'))
+
+server = None
+
+
+# HTTP/1.1 so the server keeps connections open between requests
+# Each open connection holds one of the forked workers, so idle ones time out
+class KeepAliveRequestHandler(WSGIRequestHandler):
+	protocol_version = 'HTTP/1.1'
+	timeout = IDLE_TIMEOUT
+
+	def log_request(self, *args, **kwargs):
+		pass
+
+
+def free_port():
+	with socket.socket() as probe:
+		probe.bind(('127.0.0.1', 0))
+		return probe.getsockname()[1]
+
+def serve(flask_app, port, workers):
+	make_server('127.0.0.1', port, flask_app, processes = workers, request_handler = KeepAliveRequestHandler).serve_forever()
+
+
+class LiveServer:
+
+	def __init__(self, flask_app, workers = WORKERS):
+		self.flask_app = flask_app
+		self.workers = workers
+		self.port = free_port()
+		self.url = 'http://127.0.0.1:%d' % self.port
+
+	def start(self):
+		# Forked workers must not share the parent's pooled DB connections
+		db.engine.dispose()
+		self.process = multiprocessing.get_context('fork').Process(
+			target = serve, args = (self.flask_app, self.port, self.workers), daemon = True)
+		self.process.start()
+		for attempt in range(100):
+			try:
+				socket.create_connection(('127.0.0.1', self.port), timeout = 0.1).close()
+				return self
+			except OSError:
+				time.sleep(0.05)
+		raise RuntimeError('The test server did not start on port %d' % self.port)
+
+	def stop(self):
+		self.process.terminate()
+		self.process.join()
+
+# One server per process, started on first use
+def get_server():
+	global server
+	if server is None:
+		server = LiveServer(get_app()).start()
+	return server
+
+
+class LiveResponse:
+
+	def __init__(self, status_code, headers, data):
+		self.status_code = status_code
+		self.headers = headers
+		self.data = data
+
+	def get_json(self):
+		return json.loads(self.data)
+
+	def close(self):
+		pass
+
+
+class LiveClient:
+
+	def __init__(self, live_server = None):
+		self.server = live_server or get_server()
+		self.flask_app = self.server.flask_app
+		self.cookies = {}
+		self.connection = None
+		# Seconds per request, in the order they were made, for comparing against the test client
+		self.timings = []
+
+	def get(self, *args, **kwargs):
+		return self.open(*args, method = 'GET', **kwargs)
+
+	def post(self, *args, **kwargs):
+		return self.open(*args, method = 'POST', **kwargs)
+
+	def put(self, *args, **kwargs):
+		return self.open(*args, method = 'PUT', **kwargs)
+
+	def delete(self, *args, **kwargs):
+		return self.open(*args, method = 'DELETE', **kwargs)
+
+	# Let the server worker holding this client's kept-alive connection serve someone else
+	def close(self):
+		if self.connection is not None:
+			self.connection.close()
+			self.connection = None
+
+	def open(self, path, method = 'GET', follow_redirects = False, buffered = None, **kwargs):
+		if not path.startswith('/'):
+			path = '/' + path
+		target, body, request_headers = self.encode(method, path, **kwargs)
+		response = self.request(method, target, body, request_headers)
+		for redirect in range(10):
+			if not follow_redirects or response.status_code not in (301, 302, 303, 305, 307, 308):
+				break
+			location = urlsplit(urljoin(self.server.url + target, response.headers['Location']))
+			target = location.path + ('?' + location.query if location.query else '')
+			# 307 and 308 repeat the same request at the new location, the others follow with a GET
+			if response.status_code not in (307, 308):
+				method, body, request_headers = 'GET', b'', {'Content-Length': '0'}
+			response = self.request(method, target, body, request_headers)
+		return response
+
+	# Encode the body exactly as the test client would
+	def encode(self, method, path, headers = None, **kwargs):
+		builder = EnvironBuilder(path = path, method = method, headers = headers, **kwargs)
+		try:
+			environ = builder.get_environ()
+			body = environ['wsgi.input'].read(int(environ.get('CONTENT_LENGTH') or 0))
+		finally:
+			builder.close()
+
+		request_headers = dict(builder.headers)
+		if environ.get('CONTENT_TYPE'):
+			request_headers['Content-Type'] = environ['CONTENT_TYPE']
+		request_headers['Content-Length'] = str(len(body))
+		target = builder.path + ('?' + environ['QUERY_STRING'] if environ.get('QUERY_STRING') else '')
+		return target, body, request_headers
+
+	# Send an encoded request with the current cookies on the kept-alive connection
+	def request(self, method, target, body, request_headers):
+		request_headers = dict(request_headers)
+		if self.cookies:
+			request_headers['Cookie'] = '; '.join('%s=%s' % item for item in self.cookies.items())
+
+		started = time.perf_counter()
+		for attempt in range(2):
+			if self.connection is None:
+				self.connection = http.client.HTTPConnection('127.0.0.1', self.server.port)
+			try:
+				self.connection.request(method, target, body = body, headers = request_headers)
+				reply = self.connection.getresponse()
+				data = reply.read()
+				break
+			except (http.client.HTTPException, ConnectionError):
+				# The server closed a kept-alive connection, so reconnect once
+				self.connection.close()
+				self.connection = None
+				if attempt:
+					raise
+		self.timings.append((method + ' ' + target, time.perf_counter() - started))
+
+		for header in reply.headers.get_all('Set-Cookie') or []:
+			for name, morsel in SimpleCookie(header).items():
+				if morsel.value == '' and (morsel['expires'] or morsel['max-age'] == '0'):
+					self.cookies.pop(name, None)
+				else:
+					self.cookies[name] = morsel.value
+		return LiveResponse(reply.status, reply.headers, data)
+
+	# Read and rewrite the session cookie, like FlaskClient.session_transaction
+	@contextmanager
+	def session_transaction(self):
+		interface = self.flask_app.session_interface
+		serializer = interface.get_signing_serializer(self.flask_app)
+		cookie_name = self.flask_app.config['SESSION_COOKIE_NAME']
+		session = interface.session_class(serializer.loads(self.cookies[cookie_name]) if cookie_name in self.cookies else {})
+		yield session
+		self.cookies[cookie_name] = serializer.dumps(dict(session))
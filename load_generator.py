@@ -0,0 +1,195 @@
+# Open-loop mixed-workload load generator
+# Requests arrive as a Poisson process at a fixed rate whether or not earlier ones have finished, and
+# each one's latency is counted from when it was due, so a slow app shows up as queueing instead of
+# quietly lowering the offered load. ramp() raises the rate step by step until p95 passes a target
+# Works against the in-process test client or a LiveClient (see live_server.py)
+import os, time, queue, random
+from concurrent.futures import ThreadPoolExecutor
+
+import benchmarks
+import payloads
+
+START_RATE = float(os.environ.get('LOAD_START_RATE', '5'))
+RATE_STEP = float(os.environ.get('LOAD_RATE_STEP', '1.5'))
+MAX_RATE = float(os.environ.get('LOAD_MAX_RATE', '500'))
+DURATION = float(os.environ.get('LOAD_DURATION', '10'))
+TARGET_P95 = float(os.environ.get('LOAD_TARGET_P95_MS', '500')) / 1000
+# Share of failed requests at which a level counts as saturated regardless of latency
+# Requests the app turns down by its own rules (see Action.expected_rejection) are counted apart
+MAX_ERROR_RATE = float(os.environ.get('LOAD_MAX_ERROR_RATE', '0.01'))
+
+
+# One kind of request in the mix, sent by a user of the given role
+# expected_rejection(client, context, response) tells a business-rule refusal from a failure under load
+class Action:
+
+	def __init__(self, route, role, weight, send, expected_rejection = None):
+		self.route = route
+		self.role = role
+		self.weight = weight
+		self.send = send
+		self.expected_rejection = expected_rejection
+
+def view(path):
+	return lambda client, context: client.get(path, follow_redirects=True)
+
+# context['submitted'] holds the student clients that already have a submission for the assignment
+def upload(client, context):
+	response = client.post(
+		'/files/upload/%d' % context['assignment_id'],
+		content_type='multipart/form-data',
+		data={'file': payloads.upload('test.pdf')},
+		follow_redirects=True)
+	if response.status_code < 400:
+		context['submitted'].add(client)
+	return response
+
+# The app refuses a second submission to the same assignment
+def already_submitted(client, context, response):
+	return client in context['submitted']
+
+def check_in(client, context):
+	return client.post(
+		'/classes/attendance/code/',
+		content_type='multipart/form-data',
+		data={'attendance': context['attendance_code']},
+		follow_redirects=True)
+
+def download(client, context):
+	return client.get('/files/download/%d' % random.choice(context['upload_ids']), follow_redirects=True)
+
+# Deadline-time traffic: mostly students looking at and submitting assignments, a few teachers checking on them
+DEADLINE_MIX = [
+	Action('GET /', 'student', 20, view('/')),
+	Action('GET /assignments/view', 'student', 30, view('/assignments/view')),
+	Action('POST /files/upload/<assignment_id>', 'student', 15, upload, already_submitted),
+	Action('POST /classes/attendance/code/', 'student', 15, check_in),
+	Action('GET /assignments/view (teacher)', 'teacher', 10, view('/assignments/view')),
+	Action('GET /files/download/<file_id>', 'teacher', 10, download),
+]
+
+
+# Logged-in clients per role; a request waits for a free one, like a user who only has one browser tab
+class ClientPool:
+
+	def __init__(self, clients):
+		self.clients = {}
+		for role, role_clients in clients.items():
+			self.clients[role] = queue.Queue()
+			for client in role_clients:
+				self.clients[role].put(client)
+
+	def get(self, role):
+		return self.clients[role].get()
+
+	def put(self, role, client):
+		self.clients[role].put(client)
+
+	def size(self):
+		return sum(clients.qsize() for clients in self.clients.values())
+
+
+# Arrival times in seconds from the start, exponentially spaced at the given mean rate
+def poisson_arrivals(rate, duration, generator):
+	arrivals, moment = [], generator.expovariate(rate)
+	while moment < duration:
+		arrivals.append(moment)
+		moment += generator.expovariate(rate)
+	return arrivals
+
+def perform(action, pool, context, due):
+	client = pool.get(action.role)
+	rejected = False
+	try:
+		response = action.send(client, context)
+		error = None if response.status_code < 400 else 'HTTP %d' % response.status_code
+		if error and action.expected_rejection is not None and action.expected_rejection(client, context, response):
+			error, rejected = None, True
+	except Exception as exception:
+		error = repr(exception)
+	finally:
+		pool.put(action.role, client)
+	return action.route, time.perf_counter() - due, error, rejected
+
+# Offer rate requests per second for duration seconds and return (route, latency, error, rejected) per request
+def run_at_rate(rate, pool, context, mix = DEADLINE_MIX, duration = DURATION, seed = None):
+	generator = random.Random(seed)
+	arrivals = poisson_arrivals(rate, duration, generator)
+	actions = generator.choices(mix, weights = [action.weight for action in mix], k = len(arrivals))
+
+	# Enough threads that the pool of clients, not the executor, is what requests queue for
+	with ThreadPoolExecutor(max_workers = pool.size() + 4) as executor:
+		futures = []
+		started = time.perf_counter()
+		for arrival, action in zip(arrivals, actions):
+			due = started + arrival
+			delay = due - time.perf_counter()
+			if delay > 0:
+				time.sleep(delay)
+			futures.append(executor.submit(perform, action, pool, context, due))
+		return [future.result() for future in futures]
+
+
+class Level:
+
+	def __init__(self, rate, outcomes):
+		self.rate = rate
+		self.outcomes = outcomes
+		self.routes = {}
+		for route, latency, error, rejected in outcomes:
+			self.routes.setdefault(route, []).append((latency, error, rejected))
+
+	def summary(self, route = None):
+		outcomes = self.routes.get(route, []) if route else [outcome[1:] for outcome in self.outcomes]
+		summary = benchmarks.summarise([latency for latency, error, rejected in outcomes])
+		summary['errors'] = sum(1 for latency, error, rejected in outcomes if error)
+		summary['rejected'] = sum(1 for latency, error, rejected in outcomes if rejected)
+		summary['error_rate'] = summary['errors'] / len(outcomes) if outcomes else 0.0
+		return summary
+
+	def saturated(self, route = None, target_p95 = TARGET_P95):
+		summary = self.summary(route)
+		return summary['p95'] > target_p95 or summary['error_rate'] > MAX_ERROR_RATE
+
+
+# Multiply the rate by step until the whole mix saturates or max_rate is reached
+def ramp(pool, context, mix = DEADLINE_MIX, start_rate = START_RATE, step = RATE_STEP, max_rate = MAX_RATE,
+		duration = DURATION, target_p95 = TARGET_P95, seed = None):
+	levels, rate = [], start_rate
+	while rate <= max_rate:
+		level = Level(rate, run_at_rate(rate, pool, context, mix, duration, seed))
+		levels.append(level)
+		print('%7.1f req/s offered: %s' % (rate, format_summary(level.summary())))
+		if level.saturated(target_p95 = target_p95):
+			break
+		rate *= step
+	return levels
+
+# Per route, the highest offered rate (for the whole mix) it kept p95 under target at, and the rate it first went over
+def saturation_points(levels, target_p95 = TARGET_P95):
+	points = {}
+	for route in sorted(set(route for level in levels for route in level.routes)):
+		sustained, saturated_at = None, None
+		for level in levels:
+			if route not in level.routes:
+				continue
+			if level.saturated(route, target_p95):
+				saturated_at = level.rate
+				break
+			sustained = level.rate
+		points[route] = {'sustained_rate': sustained, 'saturated_at_rate': saturated_at}
+	return points
+
+
+### Report
+def format_summary(summary):
+	return 'n=%5d  p50 %7.1f ms  p95 %7.1f ms  p99 %7.1f ms  errors %d  rejected %d' % (summary['count'],
+		summary['p50'] * 1000, summary['p95'] * 1000, summary['p99'] * 1000, summary['errors'], summary['rejected'])
+
+def report(levels, target_p95 = TARGET_P95):
+	lines = ['Saturation at p95 > %.0f ms or more than %.0f%% errors' % (target_p95 * 1000, MAX_ERROR_RATE * 100)]
+	for route, point in saturation_points(levels, target_p95).items():
+		sustained = '%.1f req/s' % point['sustained_rate'] if point['sustained_rate'] else 'none'
+		saturated = '%.1f req/s' % point['saturated_at_rate'] if point['saturated_at_rate'] else 'not reached'
+		lines.append('%-45s sustained %-12s saturated at %s' % (route, sustained, saturated))
+	return '\n'.join(lines)
@@ -0,0 +1,256 @@
+# Low-overhead profiling for load and soak runs
+# StackSampler looks at every request thread's stack a few hundred times a second instead of tracing
+# every call like cProfile, and files the samples under the request's route as collapsed stacks
+# (one 'frame;frame;frame count' line each, for flamegraph.pl or speedscope)
+# RequestTracer records per-request spans (request, SQL statements, template renders, upload saves and
+# file opens) as Chrome trace JSON, which chrome://tracing or ui.perfetto.dev open locally
+# Both only work in-process, so run the load against the test client rather than TEST_SERVER
+import os, sys, json, time, threading
+from contextlib import contextmanager
+
+from flask import request, request_started, request_finished, got_request_exception
+from flask import before_render_template, template_rendered
+from sqlalchemy import event
+from werkzeug.datastructures import FileStorage
+
+from profiling import PROFILE_DIR, safe_name
+from query_counter import IGNORED, fingerprint
+from route_timer import route_key
+
+# LOAD_PROFILE=1 makes the load and soak benchmarks run both around their measured part
+ENABLED = os.environ.get('LOAD_PROFILE') == '1'
+SAMPLE_INTERVAL = float(os.environ.get('LOAD_PROFILE_INTERVAL_MS', '5')) / 1000
+# Spans kept per trace, so a long soak cannot fill memory
+MAX_EVENTS = int(os.environ.get('LOAD_PROFILE_MAX_EVENTS', '200000'))
+
+
+### Sampling
+def frame_label(frame):
+	code = frame.f_code
+	return '%s:%s' % (os.path.splitext(os.path.basename(code.co_filename))[0], code.co_name)
+
+# Outermost frame first, as collapsed stacks expect
+def collapse(frame):
+	labels = []
+	while frame is not None:
+		labels.append(frame_label(frame))
+		frame = frame.f_back
+	return ';'.join(reversed(labels))
+
+
+class StackSampler:
+
+	def __init__(self, flask_app, interval = SAMPLE_INTERVAL):
+		self.flask_app = flask_app
+		self.interval = interval
+		# Thread ident to the route it is serving right now
+		self.serving = {}
+		# Route to {collapsed stack: samples}
+		self.stacks = {}
+		self.samples = 0
+		self.running = threading.Event()
+
+	def start(self):
+		request_started.connect(self.request_started, self.flask_app)
+		request_finished.connect(self.request_finished, self.flask_app)
+		got_request_exception.connect(self.request_finished, self.flask_app)
+		self.running.set()
+		self.thread = threading.Thread(target = self.run, name = 'stack-sampler', daemon = True)
+		self.thread.start()
+		return self
+
+	def stop(self):
+		self.running.clear()
+		self.thread.join()
+		request_started.disconnect(self.request_started, self.flask_app)
+		request_finished.disconnect(self.request_finished, self.flask_app)
+		got_request_exception.disconnect(self.request_finished, self.flask_app)
+
+	def request_started(self, sender, **extra):
+		self.serving[threading.get_ident()] = route_key()
+
+	def request_finished(self, sender, **extra):
+		self.serving.pop(threading.get_ident(), None)
+
+	def run(self):
+		while self.running.is_set():
+			frames = sys._current_frames()
+			for ident, route in list(self.serving.items()):
+				frame = frames.get(ident)
+				if frame is None:
+					continue
+				stacks = self.stacks.setdefault(route, {})
+				stack = collapse(frame)
+				stacks[stack] = stacks.get(stack, 0) + 1
+				self.samples += 1
+			del frames
+			time.sleep(self.interval)
+
+	# One .folded file per route, plus one for every route together
+	def write(self, name, directory = PROFILE_DIR):
+		os.makedirs(directory, exist_ok = True)
+		paths, everything = [], {}
+		for route, stacks in sorted(self.stacks.items()):
+			paths.append(write_folded(os.path.join(directory, '%s.%s.folded' % (name, safe_name(route))), stacks))
+			for stack, count in stacks.items():
+				everything[stack] = everything.get(stack, 0) + count
+		paths.append(write_folded(os.path.join(directory, '%s.all.folded' % name), everything))
+		return paths
+
+def write_folded(path, stacks):
+	with open(path, 'w') as folded:
+		for stack, count in sorted(stacks.items()):
+			folded.write('%s %d\n' % (stack, count))
+	return path
+
+
+### Tracing
+class RequestTracer:
+
+	def __init__(self, flask_app, engine):
+		self.flask_app = flask_app
+		self.engine = engine
+		self.events = []
+		self.dropped = 0
+		# Thread ident to the spans open on it, innermost last
+		self.open_spans = {}
+		self.original_save = None
+
+	def start(self):
+		global tracer
+		request_started.connect(self.request_started, self.flask_app)
+		request_finished.connect(self.request_finished, self.flask_app)
+		got_request_exception.connect(self.request_failed, self.flask_app)
+		before_render_template.connect(self.before_render_template, self.flask_app)
+		template_rendered.connect(self.template_rendered, self.flask_app)
+		event.listen(self.engine, 'before_cursor_execute', self.before_cursor_execute)
+		event.listen(self.engine, 'after_cursor_execute', self.after_cursor_execute)
+
+		# Upload saves go through FileStorage.save, whichever view calls it
+		self.original_save = FileStorage.save
+		original_save = self.original_save
+		def traced_save(storage, destination, *args, **kwargs):
+			self.begin('save ' + (storage.filename or 'upload'), 'file')
+			try:
+				return original_save(storage, destination, *args, **kwargs)
+			finally:
+				self.end()
+		FileStorage.save = traced_save
+
+		tracer = self
+		install_audit_hook()
+		return self
+
+	def stop(self):
+		global tracer
+		tracer = None
+		FileStorage.save = self.original_save
+		event.remove(self.engine, 'before_cursor_execute', self.before_cursor_execute)
+		event.remove(self.engine, 'after_cursor_execute', self.after_cursor_execute)
+		request_started.disconnect(self.request_started, self.flask_app)
+		request_finished.disconnect(self.request_finished, self.flask_app)
+		got_request_exception.disconnect(self.request_failed, self.flask_app)
+		before_render_template.disconnect(self.before_render_template, self.flask_app)
+		template_rendered.disconnect(self.template_rendered, self.flask_app)
+
+	def now(self):
+		return time.perf_counter() * 1000000
+
+	def in_request(self):
+		return bool(self.open_spans.get(threading.get_ident()))
+
+	def begin(self, name, category, **args):
+		self.open_spans.setdefault(threading.get_ident(), []).append((name, category, self.now(), args))
+
+	def end(self, **args):
+		spans = self.open_spans.get(threading.get_ident())
+		if not spans:
+			return
+		name, category, started, begin_args = spans.pop()
+		begin_args.update(args)
+		self.add({'name': name, 'cat': category, 'ph': 'X', 'ts': started, 'dur': self.now() - started,
+			'pid': os.getpid(), 'tid': threading.get_ident(), 'args': begin_args})
+
+	def instant(self, name, category, **args):
+		self.add({'name': name, 'cat': category, 'ph': 'i', 's': 't', 'ts': self.now(),
+			'pid': os.getpid(), 'tid': threading.get_ident(), 'args': args})
+
+	def add(self, trace_event):
+		if len(self.events) < MAX_EVENTS:
+			self.events.append(trace_event)
+		else:
+			self.dropped += 1
+
+	def request_started(self, sender, **extra):
+		self.open_spans[threading.get_ident()] = []
+		self.begin(route_key(), 'request', path = request.full_path.rstrip('?'))
+
+	def request_finished(self, sender, response = None, **extra):
+		# Close anything a failed render or query left open, then the request itself
+		spans = self.open_spans.get(threading.get_ident(), [])
+		while len(spans) > 1:
+			self.end()
+		self.end(status = response.status_code if response is not None else None)
+		self.open_spans.pop(threading.get_ident(), None)
+
+	def request_failed(self, sender, exception, **extra):
+		spans = self.open_spans.get(threading.get_ident())
+		if spans:
+			spans[0][3]['exception'] = repr(exception)
+
+	def before_render_template(self, sender, template, context, **extra):
+		if self.in_request():
+			self.begin('render ' + (template.name or 'template'), 'template')
+
+	def template_rendered(self, sender, template, context, **extra):
+		if self.in_request():
+			self.end()
+
+	def before_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+		if self.in_request() and not statement.lstrip().upper().startswith(IGNORED):
+			self.begin(fingerprint(statement)[:80], 'sql', statement = fingerprint(statement))
+
+	def after_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+		if self.in_request() and not statement.lstrip().upper().startswith(IGNORED):
+			self.end()
+
+	def write(self, name, directory = PROFILE_DIR):
+		os.makedirs(directory, exist_ok = True)
+		path = os.path.join(directory, name + '.trace.json')
+		with open(path, 'w') as trace:
+			json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms',
+				'otherData': {'dropped_events': self.dropped}}, trace)
+		return path
+
+
+# Audit hooks cannot be removed, so one hook forwards file opens to whichever tracer is running
+tracer = None
+audit_hook_installed = False
+
+def audit(name, args):
+	if name == 'open' and tracer is not None and tracer.in_request():
+		tracer.instant('open ' + os.path.basename(str(args[0])), 'file', path = str(args[0]), mode = str(args[1]))
+
+def install_audit_hook():
+	global audit_hook_installed
+	if not audit_hook_installed:
+		sys.addaudithook(audit)
+		audit_hook_installed = True
+
+
+# Sample and trace a block when LOAD_PROFILE=1, writing profiles/<name>.*.folded and <name>.trace.json
+@contextmanager
+def observe(flask_app, engine, name):
+	if not ENABLED:
+		yield None
+		return
+	sampler = StackSampler(flask_app).start()
+	request_tracer = RequestTracer(flask_app, engine).start()
+	try:
+		yield sampler, request_tracer
+	finally:
+		request_tracer.stop()
+		sampler.stop()
+		paths = sampler.write(name) + [request_tracer.write(name)]
+		print('%d stack samples and %d spans written to:\n  %s' % (
+			sampler.samples, len(request_tracer.events), '\n  '.join(paths)))
@@ -0,0 +1,118 @@
+# Upload payload provider
+# Fixture files are read from disk once per process, and every upload gets its own cheap reader
+# over the cached bytes. Synthetic PDFs of any size are generated on the fly without being held in memory
+import io, os
+
+# Fixture files live next to this module, falling back to the current directory
+FIXTURE_DIRS = [os.path.dirname(os.path.abspath(__file__)), os.getcwd()]
+
+# Cached fixture contents, by file name
+fixture_cache = {}
+
+
+### Fixture files
+def load(name):
+	if name not in fixture_cache:
+		path = next((os.path.join(folder, name) for folder in FIXTURE_DIRS
+			if os.path.exists(os.path.join(folder, name))), name)
+		with open(path, 'rb') as fixture_file:
+			fixture_cache[name] = fixture_file.read()
+	return fixture_cache[name]
+
+# BytesIO shares the cached bytes until something writes to it, so this does not copy the file
+def reader(name):
+	return io.BytesIO(load(name))
+
+# A (file, filename) pair ready to put in a multipart form, e.g. data={'file': payloads.upload('test.pdf')}
+def upload(name, filename = None):
+	return (reader(name), filename or name)
+
+
+### Synthetic PDFs
+# A single blank page whose content stream is padded with whitespace up to the requested size
+# Only the fixed header and trailer are kept in memory, the padding is produced as it is read
+class SyntheticPDF(io.RawIOBase):
+
+	FILLER = b' ' * (1024 * 1024)
+
+	def __init__(self, size):
+		self.size = size
+		self.prefix, self.padding, self.suffix = build_pdf_parts(size)
+		self.position = 0
+
+	def readable(self):
+		return True
+
+	def seekable(self):
+		return True
+
+	def tell(self):
+		return self.position
+
+	def seek(self, offset, whence = io.SEEK_SET):
+		if whence == io.SEEK_CUR:
+			offset += self.position
+		elif whence == io.SEEK_END:
+			offset += self.size
+		self.position = max(0, min(offset, self.size))
+		return self.position
+
+	def readinto(self, buffer):
+		view = memoryview(buffer).cast('B')
+		written = 0
+		while written < len(view) and self.position < self.size:
+			chunk = self.chunk_at(self.position, len(view) - written)
+			view[written:written + len(chunk)] = chunk
+			written += len(chunk)
+			self.position += len(chunk)
+		return written
+
+	# The bytes starting at offset, up to limit, from whichever part offset falls in
+	def chunk_at(self, offset, limit):
+		if offset < len(self.prefix):
+			return self.prefix[offset:offset + limit]
+		offset -= len(self.prefix)
+		if offset < self.padding:
+			return self.FILLER[:min(limit, self.padding - offset, len(self.FILLER))]
+		offset -= self.padding
+		return self.suffix[offset:offset + limit]
+
+# Work out the header, padding length and trailer (with correct xref offsets) for a PDF of exactly size bytes
+def build_pdf_parts(size):
+	objects = [
+		b'<< /Type /Catalog /Pages 2 0 R >>',
+		b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+		b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R >>',
+	]
+	header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+
+	# The /Length value and the startxref offset both change the size, so settle the padding iteratively
+	padding = 0
+	for attempt in range(10):
+		offsets = []
+		prefix = header
+		for number, body in enumerate(objects, 1):
+			offsets.append(len(prefix))
+			prefix += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+		offsets.append(len(prefix))
+		prefix += b'4 0 obj\n<< /Length %d >>\nstream\n' % padding
+
+		xref_offset = len(prefix) + padding + len(b'\nendstream\nendobj\n')
+		suffix = b'\nendstream\nendobj\nxref\n0 5\n0000000000 65535 f \n'
+		suffix += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+		suffix += b'trailer\n<< /Size 5 /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % xref_offset
+
+		remaining = size - len(prefix) - len(suffix)
+		if remaining == padding:
+			return prefix, padding, suffix
+		if remaining < 0:
+			raise ValueError('A synthetic PDF needs at least %d bytes' % (len(prefix) + len(suffix)))
+		padding = remaining
+	raise ValueError('Could not build a synthetic PDF of %d bytes' % size)
+
+def synthetic_pdf(size, filename = 'synthetic.pdf'):
+	return (SyntheticPDF(size), filename)
+
+# Fully materialised synthetic PDF, for small sizes where bytes are more convenient
+def synthetic_pdf_bytes(size):
+	return SyntheticPDF(size).read()
@@ -0,0 +1,124 @@
+# Opt-in cProfile profiling of the test suite
+# TEST_PROFILE=1 profiles every test, keeping time spent serving requests apart from time spent in
+# fixture setup (helper_functions and the test body), and TEST_PROFILE=requests also keeps one profile per request
+# Profiles are written to profiles/ (or TEST_PROFILE_DIR), and `python profiling.py` merges them into one report
+import os, re, sys, cProfile, pstats, argparse
+
+from flask import request_started, request_finished, got_request_exception
+
+from route_timer import route_key
+
+MODE = os.environ.get('TEST_PROFILE', '')
+PROFILE_DIR = os.environ.get('TEST_PROFILE_DIR', 'profiles')
+
+# Functions outside these paths (the standard library, site-packages) are left out of the report
+APP_PATH = os.sep + 'app' + os.sep
+
+
+def safe_name(text):
+	return re.sub(r'[^\w.-]+', '_', text).strip('_')
+
+
+# Two profilers take turns: fixtures runs outside requests, requests runs while the app serves one
+class TestProfiler:
+
+	def __init__(self, flask_app, test_id):
+		self.flask_app = flask_app
+		self.test_id = test_id
+		self.fixtures = cProfile.Profile()
+		self.requests = cProfile.Profile()
+		self.request_profile = None
+		self.request_count = 0
+
+	def start(self):
+		request_started.connect(self.request_started, self.flask_app)
+		request_finished.connect(self.request_finished, self.flask_app)
+		got_request_exception.connect(self.request_failed, self.flask_app)
+		self.fixtures.enable()
+		return self
+
+	def stop(self):
+		self.fixtures.disable()
+		self.requests.disable()
+		request_started.disconnect(self.request_started, self.flask_app)
+		request_finished.disconnect(self.request_finished, self.flask_app)
+		got_request_exception.disconnect(self.request_failed, self.flask_app)
+
+		os.makedirs(PROFILE_DIR, exist_ok = True)
+		self.dump(self.fixtures, 'fixtures')
+		# In per-request mode the requests were already written one by one
+		if MODE != 'requests':
+			self.dump(self.requests, 'requests')
+
+	def dump(self, profile, category, suffix = ''):
+		profile.dump_stats(os.path.join(PROFILE_DIR, '%s.%s%s.pstats' % (safe_name(self.test_id), category, suffix)))
+
+	def request_started(self, sender, **extra):
+		self.fixtures.disable()
+		# Only one profiler can be active, so per-request mode profiles each request on its own
+		if MODE == 'requests':
+			self.request_profile = cProfile.Profile()
+			self.request_profile.enable()
+		else:
+			self.requests.enable()
+
+	def request_finished(self, sender, response = None, **extra):
+		if self.request_profile is not None:
+			self.request_profile.disable()
+			self.request_count += 1
+			os.makedirs(PROFILE_DIR, exist_ok = True)
+			self.dump(self.request_profile, 'request', '.%03d.%s' % (self.request_count, safe_name(route_key())))
+			self.request_profile = None
+		else:
+			self.requests.disable()
+		self.fixtures.enable()
+
+	def request_failed(self, sender, exception, **extra):
+		self.request_finished(sender)
+
+
+# Start profiling a test when TEST_PROFILE is set, otherwise do nothing
+def profile_test(flask_app, test_id):
+	if not MODE:
+		return None
+	return TestProfiler(flask_app, test_id).start()
+
+
+### Merged report
+def merge(paths):
+	stats = None
+	for path in paths:
+		if stats is None:
+			stats = pstats.Stats(path)
+		else:
+			stats.add(path)
+	return stats
+
+def print_hottest(title, stats, limit, sort):
+	print('=' * 70)
+	print(title)
+	print('=' * 70)
+	if stats is None:
+		print('No profiles')
+		return
+	stats.sort_stats(sort)
+	stats.print_stats(re.escape(APP_PATH), limit)
+
+def report(profile_dir = PROFILE_DIR, limit = 30, sort = 'cumulative'):
+	files = sorted(os.listdir(profile_dir))
+	categories = {
+		'Fixture setup (helper_functions and test bodies)': [name for name in files if name.endswith('.fixtures.pstats')],
+		'Serving requests': [name for name in files if name.endswith('.requests.pstats') or '.request.' in name],
+	}
+	for title, names in categories.items():
+		print_hottest(title, merge(os.path.join(profile_dir, name) for name in names), limit, sort)
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description = 'Merge the per-test profiles into one ranked report')
+	parser.add_argument('profile_dir', nargs = '?', default = PROFILE_DIR)
+	parser.add_argument('--limit', type = int, default = 30)
+	parser.add_argument('--sort', default = 'cumulative', help = 'pstats sort key, e.g. cumulative or tottime')
+	args = parser.parse_args()
+	report(args.profile_dir, args.limit, args.sort)
+	sys.exit(0)
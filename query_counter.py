@@ -0,0 +1,115 @@
+# SQL query counting per request, with N+1 detection
+# Every statement the engine runs is filed under the request that ran it (or under fixtures,
+# outside of a request), together with a fingerprint that ignores literal values
+import re
+from fnmatch import fnmatch
+
+from flask import request, request_started, request_finished, got_request_exception
+from sqlalchemy import event
+
+from route_timer import route_key
+
+# Statements outside of any request, e.g. helper_functions seeding the DB
+FIXTURES = 'fixtures'
+
+# Transaction bookkeeping from the test isolation, which is not the app's own work
+IGNORED = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT', 'BEGIN')
+
+
+# Collapse literals and IN lists so the same query with different values has one fingerprint
+def fingerprint(statement):
+	statement = re.sub(r"'(?:[^']|'')*'", '?', statement)
+	statement = re.sub(r'\b\d+\b', '?', statement)
+	statement = re.sub(r'\(\s*\?(?:\s*,\s*\?)*\s*\)', '(?)', statement)
+	return re.sub(r'\s+', ' ', statement).strip()
+
+
+class RequestQueries:
+
+	def __init__(self, route, path):
+		self.route = route
+		self.path = path
+		self.statements = []
+
+	# How often each statement template ran, most repeated first
+	def repeated(self):
+		counts = {}
+		for statement in self.statements:
+			counts[statement] = counts.get(statement, 0) + 1
+		return sorted(counts.items(), key = lambda item: -item[1])
+
+	# Route and path both start with the method, e.g. 'GET /classes/attendance/view/<lesson_id>' and
+	# 'GET /classes/attendance/view/1', so a 'METHOD pattern' can match either
+	def matches(self, pattern):
+		return fnmatch(self.route, pattern) or fnmatch(self.path, pattern)
+
+
+class QueryCounter:
+
+	def __init__(self, app, engine):
+		self.app = app
+		self.engine = engine
+		self.requests = []
+		self.current = None
+		self.fixtures = RequestQueries(FIXTURES, FIXTURES)
+
+	def start(self):
+		event.listen(self.engine, 'before_cursor_execute', self.before_cursor_execute)
+		request_started.connect(self.request_started, self.app)
+		request_finished.connect(self.request_finished, self.app)
+		got_request_exception.connect(self.request_failed, self.app)
+		return self
+
+	def stop(self):
+		event.remove(self.engine, 'before_cursor_execute', self.before_cursor_execute)
+		request_started.disconnect(self.request_started, self.app)
+		request_finished.disconnect(self.request_finished, self.app)
+		got_request_exception.disconnect(self.request_failed, self.app)
+
+	def __enter__(self):
+		return self.start()
+
+	def __exit__(self, *exc_info):
+		self.stop()
+
+	def before_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+		if statement.lstrip().upper().startswith(IGNORED):
+			return
+		(self.current or self.fixtures).statements.append(fingerprint(statement))
+
+	def request_started(self, sender, **extra):
+		self.current = RequestQueries(route_key(), request.method + ' ' + request.path)
+		self.requests.append(self.current)
+
+	def request_finished(self, sender, response, **extra):
+		self.current = None
+
+	def request_failed(self, sender, exception, **extra):
+		self.current = None
+
+	# Requests over their budget, and budgeted requests repeating one statement threshold times or more
+	def violations(self, budgets, threshold):
+		violations = []
+		for queries in self.requests:
+			for pattern, budget in budgets.items():
+				if not queries.matches(pattern):
+					continue
+				if len(queries.statements) > budget:
+					violations.append('%s ran %d queries, over its budget of %d' % (
+						queries.path, len(queries.statements), budget))
+				for statement, count in queries.repeated():
+					if count >= threshold:
+						violations.append('%s repeated a statement %d times (N+1?): %s' % (
+							queries.path, count, statement))
+		return violations
+
+	def report(self):
+		lines = []
+		for queries in [self.fixtures] + self.requests:
+			if not queries.statements:
+				continue
+			lines.append('%4d queries  %s  (%s)' % (len(queries.statements), queries.path, queries.route))
+			for statement, count in queries.repeated():
+				if count > 1:
+					lines.append('      x%-4d %s' % (count, statement))
+		return '\n'.join(lines)
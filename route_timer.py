@@ -0,0 +1,52 @@
+# Per-route request timing
+# Listens to Flask's request signals and files every request's duration under its route template,
+# e.g. 'GET /classes/attendance/view/<lesson_id>'
+import time
+
+from flask import request, request_started, request_finished, got_request_exception
+
+
+# The route template of the current request, or the raw path when no rule matched (404s)
+def route_key():
+	rule = request.url_rule.rule if request.url_rule is not None else request.path + ' (unmatched)'
+	return request.method + ' ' + rule
+
+
+class RouteTimer:
+
+	def __init__(self, app):
+		self.app = app
+		self.durations = {}
+		self.started = {}
+
+	def start(self):
+		request_started.connect(self.request_started, self.app)
+		request_finished.connect(self.request_finished, self.app)
+		got_request_exception.connect(self.request_failed, self.app)
+		return self
+
+	def stop(self):
+		request_started.disconnect(self.request_started, self.app)
+		request_finished.disconnect(self.request_finished, self.app)
+		got_request_exception.disconnect(self.request_failed, self.app)
+
+	def __enter__(self):
+		return self.start()
+
+	def __exit__(self, *exc_info):
+		self.stop()
+
+	# Keyed on the request object, since signals for one request all fire in its own context
+	def request_started(self, sender, **extra):
+		self.started[id(request._get_current_object())] = time.perf_counter()
+
+	def request_finished(self, sender, response, **extra):
+		self.finish()
+
+	def request_failed(self, sender, exception, **extra):
+		self.finish()
+
+	def finish(self):
+		started = self.started.pop(id(request._get_current_object()), None)
+		if started is not None:
+			self.durations.setdefault(route_key(), []).append(time.perf_counter() - started)
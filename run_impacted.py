@@ -0,0 +1,258 @@
+# Test-impact selection runner
+# Usage: python run_impacted.py [pattern] [--all] [--dry-run]
+# Records, for every test, the source files it executed (app modules, helpers and the test module,
+# from coverage data), the routes it requested with the modules defining their views, and the templates
+# it rendered with everything they extend or include, together with the content hash of each of those
+# files. Later runs only execute tests that touch a changed file, are new, or did not pass last time,
+# and reuse the cached passing result for everything else
+# A change to code that only runs at import time (config, create_app, models, forms) reruns everything
+# --all runs and re-records every test
+import os, sys, json, time, inspect, hashlib, argparse, unittest, traceback, importlib.util
+
+import duration_history
+from run_parallel import discover_test_ids, TimedResult
+
+IMPACT_FILE = '.test_impact.json'
+
+
+### Impact map
+def file_hash(path):
+	try:
+		with open(path, 'rb') as source:
+			return hashlib.sha256(source.read()).hexdigest()
+	except OSError:
+		return None
+
+def load_map():
+	if not os.path.exists(IMPACT_FILE):
+		return {'tests': {}, 'hashes': {}, 'import_time': []}
+	with open(IMPACT_FILE) as impact_file:
+		impact = json.load(impact_file)
+	impact.setdefault('import_time', [])
+	return impact
+
+def save_map(impact):
+	with open(IMPACT_FILE, 'w') as impact_file:
+		json.dump(impact, impact_file, indent = 1, sort_keys = True)
+
+# Folders whose files count as the code under test: this repo and the app package
+def source_roots():
+	import app
+	return [os.path.abspath('.'), os.path.dirname(os.path.abspath(app.__file__))]
+
+def is_source(path, roots):
+	path = os.path.abspath(path)
+	return any(path.startswith(root + os.sep) for root in roots) and os.sep + 'site-packages' + os.sep not in path
+
+# Files whose content no longer matches the hash stored when the map was recorded
+def changed_files(impact):
+	return sorted(path for path, digest in impact['hashes'].items() if file_hash(path) != digest)
+
+# Test ids to run, and the reason for each
+def select(test_ids, impact, run_all = False):
+	changed = set(changed_files(impact))
+	import_time_changes = sorted(changed.intersection(impact['import_time']))
+	selected = {}
+	for test_id in test_ids:
+		record = impact['tests'].get(test_id)
+		if run_all:
+			selected[test_id] = 'full run'
+		elif import_time_changes:
+			selected[test_id] = 'import-time code changed: ' + ', '.join(os.path.relpath(path) for path in import_time_changes)
+		elif record is None:
+			selected[test_id] = 'not recorded yet'
+		elif record['outcome'] != 'passed':
+			selected[test_id] = 'last run ' + record['outcome']
+		else:
+			touched = changed.intersection(record['files'] + record['templates'])
+			if touched:
+				selected[test_id] = 'touches ' + ', '.join(os.path.relpath(path) for path in sorted(touched))
+	return selected
+
+
+### Recording
+# Modules that are all import-time code: config, the app factory, package and blueprint registration,
+# and the model and form classes every view builds on. Coverage never attributes them to a test, so a
+# change to any of them reruns everything. View modules are attributed through coverage and the routes
+# each test requested instead
+IMPORT_TIME_MODULES = {'config.py', 'app_provider.py', '__init__.py', 'models.py', 'forms.py'}
+
+def import_time_files(roots):
+	files = set()
+	for module in list(sys.modules.values()):
+		path = getattr(module, '__file__', None)
+		if path and os.path.basename(path) in IMPORT_TIME_MODULES and is_source(path, roots):
+			files.add(os.path.abspath(path))
+	return sorted(files)
+
+# Each test depends on its own test module, whatever coverage recorded for it
+def test_module_file(test_id):
+	module = sys.modules.get(test_id.rsplit('.', 2)[0])
+	return [os.path.abspath(module.__file__)] if module is not None and getattr(module, '__file__', None) else []
+
+# A template's file and every template it extends, includes or imports, recursively
+# A reference jinja2 cannot resolve statically (a variable name) pulls in every template instead
+def template_files(jinja_env, name, seen = None):
+	from jinja2 import meta, TemplateNotFound
+	seen = set() if seen is None else seen
+	if name in seen:
+		return set()
+	seen.add(name)
+	try:
+		source, filename, uptodate = jinja_env.loader.get_source(jinja_env, name)
+	except TemplateNotFound:
+		return set()
+	files = {os.path.abspath(filename)} if filename else set()
+	for reference in meta.find_referenced_templates(jinja_env.parse(source)):
+		names = jinja_env.list_templates() if reference is None else [reference]
+		for referenced in names:
+			files.update(template_files(jinja_env, referenced, seen))
+	return files
+
+# The module defining an endpoint's view, looking through decorators such as login_required
+def view_file(flask_app, endpoint):
+	view = flask_app.view_functions.get(endpoint)
+	if view is None:
+		return None
+	try:
+		return os.path.abspath(inspect.getsourcefile(inspect.unwrap(view)))
+	except TypeError:
+		return None
+
+# Coverage of one test, plus the routes it requested and the template files behind what it rendered
+class ImpactRecorder:
+
+	def __init__(self, flask_app, roots):
+		import coverage
+		self.flask_app = flask_app
+		self.roots = roots
+		self.coverage = coverage.Coverage(data_file = None, branch = False)
+		self.template_names = set()
+		self.routes = set()
+		self.view_files = set()
+
+	def template_rendered(self, sender, template, context, **extra):
+		if template.name:
+			self.template_names.add(template.name)
+
+	def request_started(self, sender, **extra):
+		from flask import request
+		from route_timer import route_key
+		self.routes.add(route_key())
+		path = view_file(self.flask_app, request.endpoint)
+		if path and is_source(path, self.roots):
+			self.view_files.add(path)
+
+	def __enter__(self):
+		from flask import template_rendered, request_started
+		template_rendered.connect(self.template_rendered, self.flask_app)
+		request_started.connect(self.request_started, self.flask_app)
+		self.coverage.start()
+		return self
+
+	def __exit__(self, *exc_info):
+		from flask import template_rendered, request_started
+		self.coverage.stop()
+		template_rendered.disconnect(self.template_rendered, self.flask_app)
+		request_started.disconnect(self.request_started, self.flask_app)
+
+	# Executed source files, and the view module of every route requested even where the view
+	# failed before running a line of its own
+	def files(self):
+		measured = set(path for path in self.coverage.get_data().measured_files() if is_source(path, self.roots))
+		return sorted(measured | self.view_files)
+
+	def templates(self):
+		files, seen = set(), set()
+		for name in self.template_names:
+			files.update(template_files(self.flask_app.jinja_env, name, seen))
+		return sorted(files)
+
+
+def run_selected(test_ids, impact):
+	from app_provider import get_app
+	flask_app = get_app()
+	roots = source_roots()
+
+	result = TimedResult()
+	for test_id in test_ids:
+		recorder = ImpactRecorder(flask_app, roots)
+		count = len(result.records)
+		try:
+			suite = unittest.defaultTestLoader.loadTestsFromName(test_id)
+		except Exception:
+			result.records.append({'id': test_id, 'outcome': 'error', 'duration': 0.0,
+				'details': traceback.format_exc()})
+			continue
+		with recorder:
+			suite.run(result)
+		for record in result.records[count:]:
+			impact['tests'][record['id']] = {
+				'outcome': record['outcome'],
+				'duration': record['duration'],
+				'files': sorted(set(recorder.files() + test_module_file(record['id']))),
+				'routes': sorted(recorder.routes),
+				'templates': recorder.templates()}
+	return result.records
+
+# Store the current hash of every file some recorded test depends on
+def refresh_hashes(impact):
+	paths = set()
+	for record in impact['tests'].values():
+		paths.update(record['files'] + record['templates'])
+	paths.update(impact['import_time'])
+	impact['hashes'] = {path: file_hash(path) for path in sorted(paths)}
+
+
+def run_impacted(pattern = 'test_*.py', run_all = False, dry_run = False):
+	if importlib.util.find_spec('coverage') is None:
+		print('run_impacted.py records what each test executes with coverage: pip install coverage')
+		return False
+
+	test_ids = discover_test_ids(pattern)
+	impact = load_map()
+	selected = select(test_ids, impact, run_all)
+
+	changed = changed_files(impact)
+	if changed and not run_all:
+		print('Changed since the last run:\n  ' + '\n  '.join(os.path.relpath(path) for path in changed))
+	print('Running %d of %d tests, reusing %d cached passes' % (len(selected), len(test_ids), len(test_ids) - len(selected)))
+	for test_id, reason in sorted(selected.items()):
+		print('  %s (%s)' % (test_id, reason))
+	if dry_run:
+		return True
+
+	duration_history.enable_for_runner()
+	started = time.perf_counter()
+	records = run_selected(duration_history.order([test_id for test_id in test_ids if test_id in selected]), impact)
+	elapsed = time.perf_counter() - started
+
+	# Everything imported by discovery, get_app() and the tests themselves
+	impact['import_time'] = import_time_files(source_roots())
+
+	# Tests that no longer exist drop out of the map
+	impact['tests'] = {test_id: record for test_id, record in impact['tests'].items() if test_id in test_ids}
+	refresh_hashes(impact)
+	save_map(impact)
+
+	for record in records:
+		if record['outcome'] in ('failed', 'error'):
+			print('=' * 70)
+			print(record['outcome'].upper() + ': ' + record['id'])
+			print('-' * 70)
+			print(record['details'])
+	saved = sum(impact['tests'][test_id]['duration'] for test_id in test_ids
+		if test_id not in selected and test_id in impact['tests'])
+	print('=' * 70)
+	print('Ran %d tests in %.2fs, %d cached passes saved about %.2fs' % (
+		len(records), elapsed, len(test_ids) - len(selected), saved))
+	return all(record['outcome'] in ('passed', 'skipped') for record in records)
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description = 'Run only the tests affected by changed files')
+	parser.add_argument('pattern', nargs = '?', default = 'test_*.py')
+	parser.add_argument('--all', action = 'store_true', help = 'Run and re-record every test, ignoring the cache')
+	parser.add_argument('--dry-run', action = 'store_true', help = 'Only list the tests that would run')
+	args = parser.parse_args()
+	sys.exit(0 if run_impacted(args.pattern, args.all, args.dry_run) else 1)
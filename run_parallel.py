@@ -0,0 +1,202 @@
+# Parallel sharded test runner
+# Usage: python run_parallel.py [-j WORKERS] [pattern]
+# Each worker gets its own SQLite file and upload folder, and shards are balanced
+# longest-first using the durations recorded by previous runs (see duration_history.py)
+import os, sys, json, time, heapq, shutil, tempfile, argparse, subprocess, unittest, traceback
+
+import duration_history
+from app_provider import is_upload_folder
+
+# Historical per-test durations, rewritten after every run
+DURATIONS_FILE = '.test_durations.json'
+
+# Duration assumed for tests that have never been timed
+DEFAULT_DURATION = 1.0
+
+
+### Discovery and sharding
+# List every test id matched by the pattern in the current directory
+def discover_test_ids(pattern = 'test_*.py'):
+	suite = unittest.defaultTestLoader.discover('.', pattern = pattern)
+	return [test.id() for test in iterate_suite(suite)]
+
+def iterate_suite(suite):
+	for test in suite:
+		if isinstance(test, unittest.TestSuite):
+			yield from iterate_suite(test)
+		else:
+			yield test
+
+# Last recorded durations, overridden by the duration history's median where it has one
+def load_durations():
+	durations = {}
+	if os.path.exists(DURATIONS_FILE):
+		with open(DURATIONS_FILE) as durations_file:
+			durations = json.load(durations_file)
+	durations.update(duration_history.expected_durations())
+	return durations
+
+def save_durations(durations):
+	with open(DURATIONS_FILE, 'w') as durations_file:
+		json.dump(durations, durations_file, indent = 1, sort_keys = True)
+
+# Longest-processing-time-first: hand each test to the currently lightest shard
+def build_shards(test_ids, worker_count, durations):
+	shards = [[] for i in range(worker_count)]
+	loads = [(0.0, index) for index in range(worker_count)]
+	heapq.heapify(loads)
+	for test_id in sorted(test_ids, key = lambda test_id: -durations.get(test_id, DEFAULT_DURATION)):
+		load, index = heapq.heappop(loads)
+		shards[index].append(test_id)
+		heapq.heappush(loads, (load + durations.get(test_id, DEFAULT_DURATION), index))
+	# Within a shard, run last run's failures and then the quickest tests first
+	return [duration_history.order(shard) for shard in shards if shard]
+
+
+### Worker side
+# Point the Test config at this worker's own database and upload folders
+# This must happen before any test module builds its app with create_app(Test)
+def configure_worker(worker_dir):
+	from config import Test
+	Test.SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(worker_dir, 'test.db')
+	for name in dir(Test):
+		if is_upload_folder(name):
+			folder = os.path.join(worker_dir, name.lower())
+			os.makedirs(folder, exist_ok = True)
+			setattr(Test, name, folder)
+
+class TimedResult(unittest.TestResult):
+
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.records = []
+
+	def startTest(self, test):
+		super().startTest(test)
+		self.started = time.perf_counter()
+		self.outcome = 'passed'
+		self.details = None
+
+	def stopTest(self, test):
+		super().stopTest(test)
+		self.records.append({
+			'id': test.id(),
+			'outcome': self.outcome,
+			'duration': time.perf_counter() - self.started,
+			'details': self.details})
+
+	def addError(self, test, err):
+		super().addError(test, err)
+		self.outcome, self.details = 'error', ''.join(traceback.format_exception(*err))
+
+	def addFailure(self, test, err):
+		super().addFailure(test, err)
+		self.outcome, self.details = 'failed', ''.join(traceback.format_exception(*err))
+
+	def addSkip(self, test, reason):
+		super().addSkip(test, reason)
+		self.outcome, self.details = 'skipped', reason
+
+def run_worker(worker_dir, tests_file, results_file):
+	configure_worker(worker_dir)
+	with open(tests_file) as ids_file:
+		test_ids = json.load(ids_file)
+
+	result = TimedResult()
+	for test_id in test_ids:
+		try:
+			suite = unittest.defaultTestLoader.loadTestsFromName(test_id)
+		except Exception:
+			result.records.append({'id': test_id, 'outcome': 'error', 'duration': 0.0,
+				'details': traceback.format_exc()})
+			continue
+		suite.run(result)
+
+	with open(results_file, 'w') as output:
+		json.dump(result.records, output)
+
+
+### Parent side
+def run_parallel(worker_count, pattern = 'test_*.py', keep = False):
+	test_ids = discover_test_ids(pattern)
+	durations = load_durations()
+	shards = build_shards(test_ids, worker_count, durations)
+	run_dir = tempfile.mkdtemp(prefix = 'flask-tests-')
+
+	# Workers record into one run of the duration history
+	environment = dict(os.environ)
+	if duration_history.enable_for_runner():
+		environment['TEST_HISTORY'] = '1'
+		environment['TEST_HISTORY_RUN'] = str(duration_history.start_run('run_parallel -j %d %s' % (worker_count, pattern)))
+
+	started = time.perf_counter()
+	workers = []
+	for index, shard in enumerate(shards):
+		worker_dir = os.path.join(run_dir, 'worker-%d' % index)
+		os.makedirs(worker_dir)
+		tests_file = os.path.join(worker_dir, 'tests.json')
+		results_file = os.path.join(worker_dir, 'results.json')
+		with open(tests_file, 'w') as ids_file:
+			json.dump(shard, ids_file)
+		output = open(os.path.join(worker_dir, 'output.txt'), 'w')
+		process = subprocess.Popen([sys.executable, os.path.abspath(__file__),
+			'--worker-dir', worker_dir, '--tests-file', tests_file, '--results-file', results_file],
+			stdout = output, stderr = subprocess.STDOUT, env = environment)
+		workers.append((index, process, output, worker_dir, results_file))
+
+	records = []
+	for index, process, output, worker_dir, results_file in workers:
+		process.wait()
+		output.close()
+		if os.path.exists(results_file):
+			with open(results_file) as results:
+				records.extend(json.load(results))
+		else:
+			with open(os.path.join(worker_dir, 'output.txt')) as worker_output:
+				records.append({'id': 'worker-%d' % index, 'outcome': 'error', 'duration': 0.0,
+					'details': worker_output.read()})
+	elapsed = time.perf_counter() - started
+
+	for record in records:
+		if record['outcome'] in ('passed', 'failed'):
+			durations[record['id']] = record['duration']
+	save_durations(durations)
+
+	print_report(records, shards, elapsed)
+	if not keep:
+		shutil.rmtree(run_dir, ignore_errors = True)
+	return all(record['outcome'] in ('passed', 'skipped') for record in records)
+
+def print_report(records, shards, elapsed):
+	serial = sum(record['duration'] for record in records)
+	outcomes = {}
+	for record in records:
+		outcomes[record['outcome']] = outcomes.get(record['outcome'], 0) + 1
+
+	for record in records:
+		if record['outcome'] in ('failed', 'error'):
+			print('=' * 70)
+			print(record['outcome'].upper() + ': ' + record['id'])
+			print('-' * 70)
+			print(record['details'])
+
+	print('=' * 70)
+	print('Ran %d tests on %d workers in %.2fs (%.2fs of test time, %.1fx speedup)' % (
+		len(records), len(shards), elapsed, serial, serial / elapsed if elapsed else 0))
+	print(', '.join('%s: %d' % item for item in sorted(outcomes.items())))
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description = 'Run the test suite across several processes')
+	parser.add_argument('pattern', nargs = '?', default = 'test_*.py')
+	parser.add_argument('-j', '--workers', type = int, default = os.cpu_count())
+	parser.add_argument('--keep', action = 'store_true', help = 'Keep the worker databases and logs')
+	parser.add_argument('--worker-dir', help = argparse.SUPPRESS)
+	parser.add_argument('--tests-file', help = argparse.SUPPRESS)
+	parser.add_argument('--results-file', help = argparse.SUPPRESS)
+	args = parser.parse_args()
+
+	if args.worker_dir:
+		run_worker(args.worker_dir, args.tests_file, args.results_file)
+	else:
+		sys.exit(0 if run_parallel(args.workers, args.pattern, args.keep) else 1)
@@ -0,0 +1,19 @@
+# Latency statistics shared by the benchmarks and the timing tools
+# No imports from the test harness, so anything can use it without pulling in base_case
+def percentile(values, pct):
+	if not values:
+		return 0.0
+	ordered = sorted(values)
+	index = (len(ordered) - 1) * pct / 100.0
+	lower = int(index)
+	upper = min(lower + 1, len(ordered) - 1)
+	return ordered[lower] + (ordered[upper] - ordered[lower]) * (index - lower)
+
+def summarise(durations):
+	return {
+		'count': len(durations),
+		'mean': sum(durations) / len(durations) if durations else 0.0,
+		'p50': percentile(durations, 50),
+		'p95': percentile(durations, 95),
+		'p99': percentile(durations, 99),
+		'max': max(durations) if durations else 0.0}
@@ -0,0 +1,151 @@
+# Jinja template render timing
+# Listens to Flask's before_render_template and template_rendered signals and files every render's
+# duration and context size under its template and the route that rendered it, next to the request's
+# own duration, so a report can show how much of a route's latency is spent rendering
+# TEST_TEMPLATE_REPORT=1 times every render across the suite and prints the slowest templates at exit
+import os, time, atexit, threading
+from collections.abc import Sized
+
+from flask import request_started, request_finished, got_request_exception
+from flask import before_render_template, template_rendered
+
+import stats
+from route_timer import route_key
+
+REPORT = bool(os.environ.get('TEST_TEMPLATE_REPORT'))
+REPORT_LIMIT = int(os.environ.get('TEST_TEMPLATE_REPORT_LIMIT', '20'))
+
+# Added to every context by Flask and its extensions rather than passed by the view
+INJECTED = {'config', 'request', 'session', 'g', 'current_user'}
+
+
+# Rows the template has to iterate over: the length of every list, query result or dict passed in,
+# and 1 for every other value
+def context_size(context):
+	size = 0
+	for key, value in context.items():
+		if key in INJECTED or callable(value):
+			continue
+		if isinstance(value, Sized) and not isinstance(value, (str, bytes)):
+			size += len(value)
+		else:
+			size += 1
+	return size
+
+
+class Render:
+
+	def __init__(self, template, route, seconds, size):
+		self.template = template
+		self.route = route
+		self.seconds = seconds
+		self.size = size
+
+
+class TemplateTimer:
+
+	def __init__(self, app):
+		self.app = app
+		self.renders = []
+		# Route to the total seconds spent serving it, to set render time against
+		self.request_seconds = {}
+		# Thread ident to the renders (and request) started on it and not finished yet
+		self.started = {}
+
+	def start(self):
+		request_started.connect(self.request_started, self.app)
+		request_finished.connect(self.request_finished, self.app)
+		got_request_exception.connect(self.request_finished, self.app)
+		before_render_template.connect(self.before_render_template, self.app)
+		template_rendered.connect(self.template_rendered, self.app)
+		return self
+
+	def stop(self):
+		request_started.disconnect(self.request_started, self.app)
+		request_finished.disconnect(self.request_finished, self.app)
+		got_request_exception.disconnect(self.request_finished, self.app)
+		before_render_template.disconnect(self.before_render_template, self.app)
+		template_rendered.disconnect(self.template_rendered, self.app)
+
+	def __enter__(self):
+		return self.start()
+
+	def __exit__(self, *exc_info):
+		self.stop()
+
+	def request_started(self, sender, **extra):
+		self.started[('request', threading.get_ident())] = time.perf_counter()
+
+	def request_finished(self, sender, **extra):
+		started = self.started.pop(('request', threading.get_ident()), None)
+		if started is not None:
+			route = route_key()
+			self.request_seconds[route] = self.request_seconds.get(route, 0.0) + time.perf_counter() - started
+
+	def before_render_template(self, sender, template, context, **extra):
+		self.started.setdefault(('renders', threading.get_ident()), []).append(time.perf_counter())
+
+	def template_rendered(self, sender, template, context, **extra):
+		renders = self.started.get(('renders', threading.get_ident()))
+		if not renders:
+			return
+		seconds = time.perf_counter() - renders.pop()
+		route = route_key() if ('request', threading.get_ident()) in self.started else 'outside a request'
+		self.renders.append(Render(template.name or 'template', route, seconds, context_size(context)))
+
+	# Per template: renders, total and percentile seconds, and the largest context seen
+	def by_template(self):
+		grouped = {}
+		for render in self.renders:
+			grouped.setdefault(render.template, []).append(render)
+		return {template: summarise(renders) for template, renders in grouped.items()}
+
+	# Per route: render seconds and the share of the route's request time they took
+	def by_route(self):
+		render_seconds = {}
+		for render in self.renders:
+			render_seconds[render.route] = render_seconds.get(render.route, 0.0) + render.seconds
+		shares = {}
+		for route, seconds in render_seconds.items():
+			total = self.request_seconds.get(route)
+			shares[route] = {'render_seconds': seconds, 'request_seconds': total,
+				'render_share': seconds / total if total else None}
+		return shares
+
+	def report(self, limit = REPORT_LIMIT):
+		lines = ['Slowest templates by total render time']
+		lines.append('%-50s %6s %10s %9s %9s %8s' % ('template', 'count', 'total ms', 'p50 ms', 'p95 ms', 'max ctx'))
+		templates = sorted(self.by_template().items(), key = lambda item: -item[1]['total'])
+		for template, summary in templates[:limit]:
+			lines.append('%-50s %6d %10.1f %9.2f %9.2f %8d' % (template, summary['count'], summary['total'] * 1000,
+				summary['p50'] * 1000, summary['p95'] * 1000, summary['max_context_size']))
+
+		lines.append('')
+		lines.append('Share of request time spent rendering, per route')
+		routes = sorted(self.by_route().items(), key = lambda item: -item[1]['render_seconds'])
+		for route, share in routes[:limit]:
+			percentage = '%5.1f%%' % (share['render_share'] * 100) if share['render_share'] is not None else '    -'
+			lines.append('%-60s %10.1f ms  %s' % (route, share['render_seconds'] * 1000, percentage))
+		return '\n'.join(lines)
+
+def summarise(renders):
+	seconds = [render.seconds for render in renders]
+	summary = stats.summarise(seconds)
+	summary['total'] = sum(seconds)
+	summary['max_context_size'] = max(render.size for render in renders)
+	return summary
+
+
+# One timer for the whole run, started by the first test when TEST_TEMPLATE_REPORT is set
+suite_timer = None
+
+def time_suite(app):
+	global suite_timer
+	if REPORT and suite_timer is None:
+		suite_timer = TemplateTimer(app).start()
+
+def print_report():
+	if suite_timer is not None and suite_timer.renders:
+		print('\n' + suite_timer.report())
+
+atexit.register(print_report)
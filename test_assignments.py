@@ -1,32 +1,24 @@
 # Python testing framework
-from io import BytesIO, StringIO
+from io import StringIO
 import os, unittest, warnings, string, random
 
 # Flask 
-from app import create_app
-from flask import url_for
-from config import basedir
-from config import Test
-app = create_app(Test)
+from app_provider import app
 
 # Flask models
 from app import db
-from app.models import User, Turma, LibraryUpload, PeerReviewForm
 
 TEST_DB = 'test.db'
 
 import helper_functions
+import payloads
+import checkpoints
+from base_case import BaseTestCase
 
-class TestCase(unittest.TestCase):
+class TestCase(BaseTestCase):
 	
-	def setUp(self):
-		self.app = app.test_client()
-		db.drop_all()
-		db.create_all()
-		
-	def tearDown(self):
-		db.session.remove()
-		db.drop_all()
+	# The assignments page renders a submission count per assignment, which should not cost a query per student
+	query_budgets = {'GET /assignments/view': 40}
 
 	
 	# Test adding a peer review form
@@ -41,7 +33,7 @@ class TestCase(unittest.TestCase):
 		self.assertIn(b'Login', response.data)
 		
 		# Create a student and test they can not access admin-only test pages
-		helper_functions.register_student (self, 'Pablo')
+		helper_functions.add_student (self, 'Pablo')
 		helper_functions.login(self, 'Pablo', 'test')
 		response = self.app.get('/assignments/peer-review/forms/admin', follow_redirects=True)
 		self.assertEqual(response.status_code, 403)
@@ -72,9 +64,12 @@ class TestCase(unittest.TestCase):
 			
 	# Test the assignments section
 	def test_assignments (self):
+		# Uploads go to a folder of this test's own, which the checkpoint below copies
+		checkpoints.private_uploads(self)
+
 		# Add a class and a new admin user
 		helper_functions.add_turma ()
-		helper_functions.register_student (self, 'Pablo')
+		helper_functions.add_student (self, 'Pablo')
 		helper_functions.register_admin_user()
 		helper_functions.add_teacher_to_class (teacher_id = 2, turma_id = 1)
 		
@@ -158,13 +153,11 @@ class TestCase(unittest.TestCase):
 		self.assertIn(b'Test assignment edited description', response.data)
 		
 		# Try to submit assignment file
-		with open('test.pdf', 'rb') as test_file:
-			fileIO = BytesIO(test_file.read())
-			response = self.app.post(
-				'/files/upload/1',
-				content_type='multipart/form-data', 
-				data={'file': (fileIO, 'test.pdf')},
-				follow_redirects=True)
+		response = self.app.post(
+			'/files/upload/1',
+			content_type='multipart/form-data', 
+			data={'file': payloads.upload('test.pdf')},
+			follow_redirects=True)
 		self.assertIn(b'submitted successfully', response.data)
 		
 		# Check to see if the assignment dissapeared from the index page
@@ -182,13 +175,11 @@ class TestCase(unittest.TestCase):
 		warnings.filterwarnings(action="ignore", message="unclosed", category=ResourceWarning) 
 		
 		# Try to change the file we just downloaded
-		with open('test2.pdf', 'rb') as different_test_file:
-			different_fileIO = BytesIO(different_test_file.read())
-			response = self.app.post(
-				'/files/upload/replace/1',
-				content_type='multipart/form-data', 
-				data={'file': (different_fileIO, 'test2.pdf')},
-				follow_redirects=True)
+		response = self.app.post(
+			'/files/upload/replace/1',
+			content_type='multipart/form-data', 
+			data={'file': payloads.upload('test2.pdf')},
+			follow_redirects=True)
 		self.assertIn(b'submitted successfully', response.data)
 		
 		# Try to download the file we just replaced (should be removed from the DB, although not deleted)
@@ -212,15 +203,13 @@ class TestCase(unittest.TestCase):
 		# Try and submit a review, with an uploaded correction file
 		response = self.app.get('/assignments/review/create/2/teacher', follow_redirects=True)
 		self.assertIn(b'Submit a teacher review', response.data)
-		with open('test2.pdf', 'rb') as different_test_file:
-			different_fileIO = BytesIO(different_test_file.read())
-			response = self.app.post(
-				'/assignments/review/create/2/teacher',
-				content_type='multipart/form-data', 
-				data={'comments:': 'Test comments',
-					  'file': (different_fileIO, 'test2.pdf')
-					  },
-				follow_redirects=True)
+		response = self.app.post(
+			'/assignments/review/create/2/teacher',
+			content_type='multipart/form-data', 
+			data={'comments:': 'Test comments',
+				  'file': payloads.upload('test2.pdf')
+				  },
+			follow_redirects=True)
 		self.assertIn(b'Teacher review submitted', response.data)
 		
 		# Try to delete this uploaded assignment (+ comment and uploaded grading file)
@@ -237,13 +226,11 @@ class TestCase(unittest.TestCase):
 		# Upload a final new file for this student
 		response = self.app.get('/files/upload/1/2', follow_redirects=True)
 		self.assertEqual(response.status_code, 200)
-		with open('test.pdf', 'rb') as test_file:
-			fileIO = BytesIO(test_file.read())
-			response = self.app.post(
-				'/files/upload/1/2',
-				content_type='multipart/form-data', 
-				data={'file': (fileIO, 'test.pdf')},
-				follow_redirects=True)
+		response = self.app.post(
+			'/files/upload/1/2',
+			content_type='multipart/form-data', 
+			data={'file': payloads.upload('test.pdf')},
+			follow_redirects=True)
 		self.assertEqual(response.status_code, 200)
 		self.assertIn(b'submitted successfully', response.data)
 		response = self.app.get('/assignments/view', follow_redirects=True)
@@ -258,7 +245,7 @@ class TestCase(unittest.TestCase):
 		
 		# Test registering another student
 		helper_functions.logout (self)
-		helper_functions.register_student (self, 'Pingkee')
+		helper_functions.add_student (self, 'Pingkee')
 		helper_functions.logout (self)
 		helper_functions.login(self, 'Pingkee')
 		
@@ -274,15 +261,11 @@ class TestCase(unittest.TestCase):
 		self.assertEqual(response.status_code, 404)
 		
 		# Try to submit assignment file for the student as an admin
-		with open('test.pdf', 'rb') as test_file:
-			fileIO = BytesIO(test_file.read())
-			response = self.app.post(
-				'/files/upload/1',
-				content_type='multipart/form-data', 
-				data={'file': (fileIO, 'test.pdf')},
-				follow_redirects=True)
-			
-		test_file.close()
+		response = self.app.post(
+			'/files/upload/1',
+			content_type='multipart/form-data', 
+			data={'file': payloads.upload('test.pdf')},
+			follow_redirects=True)
 		self.assertIn(b'submitted successfully', response.data)
 		
 		# Check that both assignments have been uploaded
@@ -295,22 +278,25 @@ class TestCase(unittest.TestCase):
 		response = self.app.get('assignments/close/1', follow_redirects=True)
 		self.assertEqual(response.status_code, 200)
 		helper_functions.logout (self)
+		checkpoints.save(self, 'assignment-closed')
+	
+	# The late stage starts from the closed assignment (two of two submitted) instead of replaying the whole scenario
+	def test_late_submission (self):
+		checkpoints.resume(self, 'assignment-closed', self.test_assignments)
 		
 		# Register as a third student and try to submit the late assignment
-		helper_functions.register_student(self, 'Pingrol')
+		helper_functions.add_student(self, 'Pingrol')
 		helper_functions.login(self, 'Pingrol')
 		response = self.app.get('/', follow_redirects=True)
 		self.assertIn(b'Upcoming assignments', response.data)
 		self.assertIn(b'Assignment overdue', response.data)
 		
 		# Try to submit (late) assignment file
-		with open('test.pdf', 'rb') as test_file:
-			fileIO = BytesIO(test_file.read())
-			response = self.app.post(
-				'/files/upload/1',
-				content_type='multipart/form-data', 
-				data={'file': (fileIO, 'test.pdf')},
-				follow_redirects=True)
+		response = self.app.post(
+			'/files/upload/1',
+			content_type='multipart/form-data', 
+			data={'file': payloads.upload('test.pdf')},
+			follow_redirects=True)
 		# Upload attempt to overdue assignment should fail
 		self.assertEqual(response.status_code, 403)
 		
@@ -323,13 +309,11 @@ class TestCase(unittest.TestCase):
 		# Try and submit the assignment for the student
 		response = self.app.get('/files/upload/1/4', follow_redirects=True)
 		self.assertEqual(response.status_code, 200)
-		with open('test.pdf', 'rb') as test_file:
-			fileIO = BytesIO(test_file.read())
-			response = self.app.post(
-				'/files/upload/1/4',
-				content_type='multipart/form-data', 
-				data={'file': (fileIO, 'test.pdf')},
-				follow_redirects=True)
+		response = self.app.post(
+			'/files/upload/1/4',
+			content_type='multipart/form-data', 
+			data={'file': payloads.upload('test.pdf')},
+			follow_redirects=True)
 		self.assertEqual(response.status_code, 200)
 		self.assertIn(b'submitted successfully', response.data)
 		response = self.app.get('/assignments/view', follow_redirects=True)
@@ -1,32 +1,24 @@
 # Python testing framework
-from io import BytesIO, StringIO
+from io import StringIO
 import os, unittest, warnings, string, random
 
 # Flask 
-from app import create_app
-from flask import url_for
-from config import basedir
-from config import Test
-app = create_app(Test)
+from app_provider import app
 
 # Flask models
 from app import db
-from app.classes.models import AbsenceJustificationUpload, AttendanceCode
+from app.classes.models import AttendanceCode
 
 TEST_DB = 'test.db'
 
 import helper_functions
+import payloads
+from base_case import BaseTestCase
 
-class TestCase(unittest.TestCase):
+class TestCase(BaseTestCase):
 	
-	def setUp(self):
-		self.app = app.test_client()
-		db.drop_all()
-		db.create_all()
-		
-	def tearDown(self):
-		db.session.remove()
-		db.drop_all()
+	# The attendance pages list every student in the class, which should not cost a query per student
+	query_budgets = {'GET /classes/attendance/view/*': 40}
 		
 	def test_class_attendance_justification (self):
 
@@ -40,7 +32,7 @@ class TestCase(unittest.TestCase):
 		helper_functions.add_turma ()
 		helper_functions.register_admin_user()	
 		helper_functions.add_teacher_to_class (teacher_id = 1, turma_id = 1)
-		helper_functions.register_student (self, 'Pablo')
+		helper_functions.add_student (self, 'Pablo')
 
 		helper_functions.logout (self)
 		helper_functions.login(self, 'Patrick')
@@ -116,16 +108,14 @@ class TestCase(unittest.TestCase):
 		self.assertIn(b'Upload absence justification', response.data)
 
 		# Add an absence justification
-		with open('test.pdf', 'rb') as test_file:
-			fileIO = BytesIO(test_file.read())
-			response = self.app.post(
-				'/classes/absence/justification/1',
-				content_type='multipart/form-data', 
-				data={
-					'absence_justification_file': (fileIO, 'test.pdf'),
-					'justification': 'Justification description'
-					},
-				follow_redirects=True)
+		response = self.app.post(
+			'/classes/absence/justification/1',
+			content_type='multipart/form-data', 
+			data={
+				'absence_justification_file': payloads.upload('test.pdf'),
+				'justification': 'Justification description'
+				},
+			follow_redirects=True)
 		self.assertEqual(response.status_code, 200)
 		self.assertIn(b'New justification uploaded successfully!', response.data)
 		self.assertIn(b'View uploaded', response.data)
@@ -151,16 +141,14 @@ class TestCase(unittest.TestCase):
 		helper_functions.login(self, 'Pablo')
 
 		# Add an absence justification
-		with open('test.pdf', 'rb') as test_file:
-			fileIO = BytesIO(test_file.read())
-			response = self.app.post(
-				'/classes/absence/justification/1',
-				content_type='multipart/form-data', 
-				data={
-					'absence_justification_file': (fileIO, 'test.pdf'),
-					'justification': 'Justification description again'
-					},
-				follow_redirects=True)
+		response = self.app.post(
+			'/classes/absence/justification/1',
+			content_type='multipart/form-data', 
+			data={
+				'absence_justification_file': payloads.upload('test.pdf'),
+				'justification': 'Justification description again'
+				},
+			follow_redirects=True)
 		self.assertEqual(response.status_code, 200)
 		self.assertIn(b'New justification uploaded successfully!', response.data)
 		self.assertIn(b'View uploaded', response.data)
@@ -204,7 +192,7 @@ class TestCase(unittest.TestCase):
 
 		# Register a new student 
 		helper_functions.logout (self)
-		helper_functions.register_student (self, 'Pingkee')
+		helper_functions.add_student (self, 'Pingkee')
 
 		# Try to sign up to the class without a valid log-in code
 		response = self.app.post(
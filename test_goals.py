@@ -4,33 +4,19 @@ import os, unittest, warnings, string, random
 from datetime import datetime
 
 # Flask 
-from app import create_app
-from flask import url_for
-from config import basedir
-from config import Test
-app = create_app(Test)
+from app_provider import app
 
 # Flask models
 from app import db
 
-from app.goals.models import StudentGoal
-
 import json 
 
 TEST_DB = 'test.db'
 
-from app.tests import helper_functions
+import helper_functions
+from base_case import BaseTestCase
 
-class TestCase(unittest.TestCase):
-	
-	def setUp(self):
-		self.app = app.test_client()
-		db.drop_all()
-		db.create_all()
-		
-	def tearDown(self):
-		db.session.remove()
-		db.drop_all()
+class TestCase(BaseTestCase):
 		
 	# Test goal pages
 	def test_goals(self):
@@ -43,7 +29,7 @@ class TestCase(unittest.TestCase):
 		helper_functions.register_admin_user()
 		helper_functions.logout(self)
 		helper_functions.add_turma ()
-		helper_functions.register_student (self, 'Pablo')
+		helper_functions.add_student (self, 'Pablo')
 		helper_functions.logout(self)
 		
 		# View goals page
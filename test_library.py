@@ -1,39 +1,26 @@
 # Python testing framework
-from io import BytesIO, StringIO
+from io import StringIO
 import os, unittest, warnings, string, random
 
 # Flask 
-from app import create_app
-from flask import url_for
-from config import basedir
-from config import Test
-app = create_app(Test)
+from app_provider import app
 
 # Flask models
 from app import db
-from app.files import models
-from app.models import User, Turma, LibraryUpload, PeerReviewForm
+from app.models import LibraryUpload
 
 TEST_DB = 'test.db'
 
 import helper_functions
+from base_case import BaseTestCase
 
-class TestCase(unittest.TestCase):
-	
-	def setUp(self):
-		self.app = app.test_client()
-		db.drop_all()
-		db.create_all()
-		
-	def tearDown(self):
-		db.session.remove()
-		db.drop_all()
+class TestCase(BaseTestCase):
 		
 	def test_library_api (self):
 		# Add a class and a new admin user
 		helper_functions.add_turma ()
 		helper_functions.register_admin_user()	
-		helper_functions.register_student (self, 'Pablo')
+		helper_functions.add_student (self, 'Pablo')
 		helper_functions.add_teacher_to_class (teacher_id = 1, turma_id = 1)
 
 		helper_functions.logout (self)
@@ -44,20 +31,7 @@ class TestCase(unittest.TestCase):
 		
 		# Add a test library file
 		#!# This should be done via a new API call, or at least the model, not via the GUI
-		with open('test.pdf', 'rb') as test_file:
-			fileIO = BytesIO(test_file.read())
-			response = self.app.post(
-				'/files/library/upload/',
-				content_type='multipart/form-data', 
-				data={
-					'library_upload_file': (fileIO, 'test.pdf'),
-					'title': 'Test library upload',
-					'description': 'Test library upload description',
-					'target_turmas': 1
-					},
-				follow_redirects=True)
-		self.assertEqual(response.status_code, 200)
-		self.assertIn(b'New file successfully added to the library!', response.data)
+		helper_functions.upload_library_file (self)
 		assert LibraryUpload.query.get(1).title == 'Test library upload'
 
 		# Test get all uploads
@@ -107,7 +81,7 @@ class TestCase(unittest.TestCase):
 		# Add a class and a new admin user
 		helper_functions.add_turma ()
 		helper_functions.add_turma ()
-		helper_functions.register_student (self, 'Pablo')
+		helper_functions.add_student (self, 'Pablo')
 		helper_functions.register_admin_user()
 		helper_functions.add_teacher_to_class (teacher_id = 2, turma_id = 1)
 		helper_functions.add_teacher_to_class (teacher_id = 2, turma_id = 2)
@@ -122,20 +96,7 @@ class TestCase(unittest.TestCase):
 		response = self.app.get('/files/library/upload', follow_redirects=True)
 		self.assertEqual(response.status_code, 200)
 		
-		with open('test.pdf', 'rb') as test_file:
-			fileIO = BytesIO(test_file.read())
-			response = self.app.post(
-				'/files/library/upload/',
-				content_type='multipart/form-data', 
-				data={
-					'library_upload_file': (fileIO, 'test.pdf'),
-					'title': 'Test library upload',
-					'description': 'Test library upload description',
-					'target_turmas': 1
-					},
-				follow_redirects=True)
-		self.assertEqual(response.status_code, 200)
-		self.assertIn(b'New file successfully added to the library!', response.data)
+		helper_functions.upload_library_file (self)
 		
 		# There should be 0 downloads of this  file
 		response = self.app.get('/files/library/view/downloads/1', follow_redirects=True)
@@ -3,30 +3,17 @@ from io import BytesIO, StringIO
 import os, unittest, warnings, string, random
 
 # Flask 
-from app import create_app
-from flask import url_for
-from config import basedir
-from config import Test
-app = create_app(Test)
+from app_provider import app
 
 # Flask models
 from app import db
-from app.models import User, Turma, LibraryUpload, PeerReviewForm
 
 TEST_DB = 'test.db'
 
 import helper_functions
+from base_case import BaseTestCase
 
-class TestCase(unittest.TestCase):
-	
-	def setUp(self):
-		self.app = app.test_client()
-		db.drop_all()
-		db.create_all()
-		
-	def tearDown(self):
-		db.session.remove()
-		db.drop_all()
+class TestCase(BaseTestCase):
 		
 	# Test admin pages  
 	def test_mentors(self):
@@ -35,7 +22,7 @@ class TestCase(unittest.TestCase):
 		helper_functions.logout(self)
 		helper_functions.register_admin_user('Pingkee') # Registers Pingkee
 		helper_functions.add_turma ()
-		helper_functions.register_student (self, 'Pablo')
+		helper_functions.add_student (self, 'Pablo')
 		helper_functions.logout(self)
 		
 		# View student management page
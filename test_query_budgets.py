@@ -0,0 +1,83 @@
+# Python testing framework
+import unittest
+
+# Flask
+from app_provider import app
+
+# Flask models
+from app import db
+
+import helper_functions
+import fixtures
+import datasets
+import payloads
+from base_case import BaseTestCase
+
+class TestCase(BaseTestCase):
+
+	# The pages that list every student of a class, budgeted on a class bigger than n_plus_one_threshold,
+	# so a statement run once per student fails the test as N+1
+	query_budgets = {
+		'GET /assignments/view': 40,
+		'GET /classes/attendance/view/*': 40,
+		'GET /user/students/manage': 40,
+	}
+
+	PAGES = ['/assignments/view', '/classes/attendance/view/1/', '/user/students/manage']
+
+	# Queries each page ran on its latest request
+	def page_queries (self):
+		paths = set('GET ' + page for page in self.PAGES) | set('GET ' + page.rstrip('/') for page in self.PAGES)
+		counts = {}
+		for queries in self.query_counter.requests:
+			if queries.path in paths:
+				counts[queries.path.rstrip('/')] = len(queries.statements)
+		return counts
+
+	def submit_for (self, student_ids):
+		for student_id in student_ids:
+			response = self.app.post(
+				'/files/upload/1/%d' % student_id,
+				content_type='multipart/form-data',
+				data={'file': payloads.upload('test.pdf')},
+				follow_redirects=True)
+			self.assertIn(b'submitted successfully', response.data)
+			response.close()
+
+	def test_class_pages_with_many_students (self):
+		students = self.n_plus_one_threshold * 2
+
+		# One class, taught by Patrick, with more students than the N+1 threshold
+		teacher_id = fixtures.create_admins(1, usernames = ['Patrick'])[0]
+		turma_ids = fixtures.create_turmas(1)
+		fixtures.assign_teachers([teacher_id], turma_ids)
+		student_ids = fixtures.create_users(students)
+		fixtures.enrol_students(student_ids, turma_ids)
+		helper_functions.add_peer_review_form ()
+
+		helper_functions.login(self, 'Patrick')
+		datasets.create_assignment(self, turma_ids[0])
+		datasets.create_lesson(self, turma_ids[0])
+		self.submit_for(student_ids)
+
+		for page in self.PAGES:
+			response = self.app.get(page, follow_redirects=True)
+			self.assertEqual(response.status_code, 200)
+			response.close()
+		before = self.page_queries()
+		self.assertEqual(len(before), len(self.PAGES))
+
+		# Doubling the class must not change how many queries the pages run
+		more_student_ids = fixtures.create_users(students)
+		fixtures.enrol_students(more_student_ids, turma_ids)
+		self.submit_for(more_student_ids)
+
+		for page in self.PAGES:
+			response = self.app.get(page, follow_redirects=True)
+			self.assertEqual(response.status_code, 200)
+			response.close()
+		self.assertEqual(self.page_queries(), before)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,38 @@
+# Python testing framework
+import unittest
+
+from query_counter import RequestQueries, fingerprint
+
+class TestCase(unittest.TestCase):
+
+	# The same query with different literals has one fingerprint
+	def test_fingerprint (self):
+		self.assertEqual(fingerprint("SELECT * FROM user WHERE id = 12 AND username = 'Pablo'"),
+			'SELECT * FROM user WHERE id = ? AND username = ?')
+		self.assertEqual(fingerprint("SELECT * FROM user WHERE username = 'O''Brien'"),
+			'SELECT * FROM user WHERE username = ?')
+		self.assertEqual(fingerprint('SELECT * FROM turma WHERE id IN (1, 2,3)'), fingerprint('SELECT * FROM turma WHERE id IN (4)'))
+		self.assertEqual(fingerprint('SELECT *\n\tFROM   user'), 'SELECT * FROM user')
+		# Digits inside names are not literals
+		self.assertEqual(fingerprint('SELECT user2.id FROM user AS user2'), 'SELECT user2.id FROM user AS user2')
+
+	# Budgets match the route template or the concrete path, always with the method
+	def test_matches (self):
+		queries = RequestQueries('GET /classes/attendance/view/<lesson_id>', 'GET /classes/attendance/view/1')
+		self.assertTrue(queries.matches('GET /classes/attendance/view/<lesson_id>'))
+		self.assertTrue(queries.matches('GET /classes/attendance/view/*'))
+		self.assertTrue(queries.matches('GET /classes/attendance/view/1'))
+		self.assertTrue(queries.matches('* /classes/attendance/view/1'))
+		self.assertFalse(queries.matches('POST /classes/attendance/view/1'))
+		self.assertFalse(queries.matches('POST /classes/attendance/view/*'))
+		self.assertFalse(queries.matches('GET /classes/attendance/view/2'))
+		self.assertFalse(queries.matches('/classes/attendance/view/1'))
+
+	def test_repeated (self):
+		queries = RequestQueries('GET /user/students/manage', 'GET /user/students/manage')
+		queries.statements = ['SELECT a', 'SELECT b', 'SELECT a']
+		self.assertEqual(queries.repeated(), [('SELECT a', 2), ('SELECT b', 1)])
+
+
+if __name__ == '__main__':
+	unittest.main()
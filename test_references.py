@@ -1,32 +1,20 @@
 # Python testing framework
-from io import BytesIO, StringIO
+from io import StringIO
 import os, unittest, warnings, string, random
 
 # Flask 
-from app import create_app
-from flask import url_for
-from config import basedir
-from config import Test
-app = create_app(Test)
+from app_provider import app
 
 # Flask models
 from app import db
-from app.models import User, Turma, LibraryUpload, PeerReviewForm
 
 TEST_DB = 'test.db'
 
 import helper_functions
+import payloads
+from base_case import BaseTestCase
 
-class TestCase(unittest.TestCase):
-	
-	def setUp(self):
-		self.app = app.test_client()
-		db.drop_all()
-		db.create_all()
-		
-	def tearDown(self):
-		db.session.remove()
-		db.drop_all()
+class TestCase(BaseTestCase):
 
 	
 	# Test adding a peer review form
@@ -35,7 +23,7 @@ class TestCase(unittest.TestCase):
 		helper_functions.register_admin_user()
 		helper_functions.logout(self)
 		helper_functions.add_turma ()
-		helper_functions.register_student (self, 'Pablo')
+		helper_functions.add_student (self, 'Pablo')
 		helper_functions.logout(self)
 		
 		# View main references public log-in page
@@ -112,16 +100,14 @@ class TestCase(unittest.TestCase):
 		# To fix?
 		warnings.filterwarnings(action="ignore", message="unclosed", category=ResourceWarning) 
 		
-		with open('test.pdf', 'rb') as test_file:
-			fileIO = BytesIO(test_file.read())
-			response = self.app.post(
-				'/references/1/version/upload',
-				content_type='multipart/form-data', 
-				data={
-					'reference_upload_file': (fileIO, 'test.pdf'),
-					'description': 'Teacher uploaded reference'
-				},
-				follow_redirects=True)
+		response = self.app.post(
+			'/references/1/version/upload',
+			content_type='multipart/form-data', 
+			data={
+				'reference_upload_file': payloads.upload('test.pdf'),
+				'description': 'Teacher uploaded reference'
+			},
+			follow_redirects=True)
 		self.assertIn(b'New reference version successfully added library!', response.data)
 		self.assertIn(b'Teacher uploaded reference', response.data)
 		
@@ -151,7 +137,7 @@ class TestCase(unittest.TestCase):
 		
 		# Permissions checks
 		helper_functions.logout(self)
-		helper_functions.register_student (self, 'Pingkee')
+		helper_functions.add_student (self, 'Pingkee')
 		helper_functions.login(self, 'Pingkee')
 		
 		response = self.app.get('/references/view/project/1', follow_redirects=True)
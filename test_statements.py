@@ -1,33 +1,21 @@
 # Python testing framework
-from io import BytesIO, StringIO
+from io import StringIO
 import os, unittest, warnings, string, random
 
 # Flask 
-from app import create_app
-from flask import url_for
-from config import basedir
-from config import Test
-app = create_app(Test)
+from app_provider import app
 
 # Flask models
 from app import db
-from app.models import User, Turma, LibraryUpload, PeerReviewForm
 
 TEST_DB = 'test.db'
 
 import helper_functions
+import payloads
+from base_case import BaseTestCase
 
 
-class TestCase(unittest.TestCase):
-
-	def setUp(self):
-		self.app = app.test_client()
-		db.drop_all()
-		db.create_all()
-
-	def tearDown(self):
-		db.session.remove()
-		db.drop_all()
+class TestCase(BaseTestCase):
 
 	# Test adding a peer review form
 
@@ -37,7 +25,7 @@ class TestCase(unittest.TestCase):
 		helper_functions.register_admin_user()
 		helper_functions.add_turma()
 		helper_functions.logout(self)
-		helper_functions.register_student(self, 'Pablo')
+		helper_functions.add_student(self, 'Pablo')
 
 		# Check the empty statement page contains a link to the builder
 		response = self.app.get('/statements/', follow_redirects=True)
@@ -85,16 +73,14 @@ class TestCase(unittest.TestCase):
 		warnings.filterwarnings(
 			action="ignore", message="unclosed", category=ResourceWarning)
 
-		with open('test.pdf', 'rb') as test_file:
-			fileIO = BytesIO(test_file.read())
-			response = self.app.post(
-				'/statements/upload/1',
-				content_type='multipart/form-data',
-				data={
-					'statement_upload_file': (fileIO, 'test.pdf'),
-					'description': 'Test upload description'
-				},
-				follow_redirects=True)
+		response = self.app.post(
+			'/statements/upload/1',
+			content_type='multipart/form-data',
+			data={
+				'statement_upload_file': payloads.upload('test.pdf'),
+				'description': 'Test upload description'
+			},
+			follow_redirects=True)
 		self.assertIn(
 			b'New personal statement successfully uploaded!', response.data)
 		self.assertIn(b'test.pdf', response.data)
@@ -107,7 +93,7 @@ class TestCase(unittest.TestCase):
 
 		# View project: permissions test
 		helper_functions.logout(self)
-		helper_functions.register_student(self, 'Pingkee')
+		helper_functions.add_student(self, 'Pingkee')
 		helper_functions.logout(self)
 		helper_functions.login(self, 'Pingkee')
 		response = self.app.get(
@@ -183,16 +169,14 @@ class TestCase(unittest.TestCase):
 		self.assertIn(b"You haven't uploaded any statements", response.data)
 
 		# Upload a first draft statement
-		with open('test.pdf', 'rb') as test_file:
-			fileIO = BytesIO(test_file.read())
-			response = self.app.post(
-				'/statements/upload/2',
-				content_type='multipart/form-data',
-				data={
-					'statement_upload_file': (fileIO, 'test.pdf'),
-					'description': 'Test upload description'
-				},
-				follow_redirects=True)
+		response = self.app.post(
+			'/statements/upload/2',
+			content_type='multipart/form-data',
+			data={
+				'statement_upload_file': payloads.upload('test.pdf'),
+				'description': 'Test upload description'
+			},
+			follow_redirects=True)
 		self.assertIn(
 			b'New personal statement successfully uploaded!', response.data)
 		self.assertIn(b'test.pdf', response.data)
@@ -209,16 +193,14 @@ class TestCase(unittest.TestCase):
 		self.assertIn(b'Upload a new statement', response.data)
 
 		# Upload a first draft statement
-		with open('test.pdf', 'rb') as test_file:
-			fileIO = BytesIO(test_file.read())
-			response = self.app.post(
-				'/statements/upload/2',
-				content_type='multipart/form-data',
-				data={
-					'statement_upload_file': (fileIO, 'test.pdf'),
-					'description': 'Teacher uploaded file description'
-				},
-				follow_redirects=True)
+		response = self.app.post(
+			'/statements/upload/2',
+			content_type='multipart/form-data',
+			data={
+				'statement_upload_file': payloads.upload('test.pdf'),
+				'description': 'Teacher uploaded file description'
+			},
+			follow_redirects=True)
 		self.assertIn(
 			b'New personal statement successfully uploaded!', response.data)
 		self.assertIn(b'Teacher uploaded file description', response.data)
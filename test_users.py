@@ -3,30 +3,19 @@ from io import BytesIO, StringIO
 import os, unittest, warnings, string, random
 
 # Flask 
-from app import create_app
-from flask import url_for
-from config import basedir
-from config import Test
-app = create_app(Test)
+from app_provider import app
 
 # Flask models
 from app import db
-from app.models import User, Turma, LibraryUpload, PeerReviewForm
+from app.models import User
 
 TEST_DB = 'test.db'
 
 import helper_functions
+import fixtures
+from base_case import BaseTestCase
 
-class TestCase(unittest.TestCase):
-	
-	def setUp(self):
-		self.app = app.test_client()
-		db.drop_all()
-		db.create_all()
-		
-	def tearDown(self):
-		db.session.remove()
-		db.drop_all()
+class TestCase(BaseTestCase):
 
 	# Test public pages, without logging in
 	def test_public_facing_pages (self):
@@ -60,6 +49,31 @@ class TestCase(unittest.TestCase):
 		assert new_user.username == 'Peter'
 		
 		
+	# Fixture users share a cheap precomputed hash, so exercise the app's real hashing path here
+	def test_real_password_hashing (self):
+		user = User(username='Peter', email='peter@example.com', student_number='12345', email_confirmed = 1)
+		user.set_password('test')
+		db.session.add(user)
+		db.session.commit()
+		
+		assert user.password_hash != fixtures.password_hash_for('test')
+		assert user.check_password('test') == True
+		assert user.check_password('testx') == False
+		
+		response = helper_functions.login(self, 'Peter', 'test')
+		self.assertEqual(response.status_code, 200)
+		self.assertNotIn(b'Invalid username', response.data)
+		
+	# Register students through the full signup flow
+	def test_register_student (self):
+		helper_functions.add_turma ()
+		helper_functions.register_student (self, 'Pablo')
+		helper_functions.logout (self)
+		helper_functions.register_student (self, 'Pingkee', confirm_email = False)
+		
+		assert User.query.filter_by(username='Pablo').first().email_confirmed == True
+		assert User.query.filter_by(username='Pingkee').first().email_confirmed == False
+		
 	# Create an admin called Patrick with password test
 	def test_add_admin_user (self):
 		helper_functions.register_admin_user()